@@ -5,6 +5,7 @@ from pathlib import Path
 from urllib.parse import parse_qsl, urlparse
 
 from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -70,6 +71,33 @@ SPECTACULAR_SETTINGS = {
 
 CORS_ALLOWED_ORIGINS = CSRF_TRUSTED_ORIGINS
 
+# IDEMPOTENCY KEYS (POST /api/trips/)
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", cast=int, default=86400)  # seconds
+# An in-progress claim expires after this long, so a crashed request does not block its key.
+# It must outlast the longest trip creation: one ORS request after the retry budget is spent
+ORS_MAX_SECONDS = config("OPENROUTESERVICE_TIMEOUT", cast=float, default=60) + config(
+    "OPENROUTESERVICE_RETRY_TIMEOUT", cast=float, default=60
+)
+IDEMPOTENCY_LEASE_MARGIN = 30  # seconds for routing-independent work (HOS plan, logs, map)
+IDEMPOTENCY_LEASE = config(
+    "IDEMPOTENCY_LEASE", cast=int, default=int(ORS_MAX_SECONDS) + IDEMPOTENCY_LEASE_MARGIN
+)  # seconds
+if IDEMPOTENCY_LEASE < ORS_MAX_SECONDS + IDEMPOTENCY_LEASE_MARGIN:
+    raise ImproperlyConfigured(
+        f"IDEMPOTENCY_LEASE ({IDEMPOTENCY_LEASE}s) must be at least OPENROUTESERVICE_TIMEOUT "
+        f"plus OPENROUTESERVICE_RETRY_TIMEOUT plus {IDEMPOTENCY_LEASE_MARGIN}s "
+        f"({ORS_MAX_SECONDS + IDEMPOTENCY_LEASE_MARGIN:g}s), or a retry could claim the key "
+        "of a request that is still processing."
+    )
+IDEMPOTENCY_WAIT_TIMEOUT = config("IDEMPOTENCY_WAIT_TIMEOUT", cast=float, default=30)  # seconds
+IDEMPOTENCY_POLL_INTERVAL = config("IDEMPOTENCY_POLL_INTERVAL", cast=float, default=0.25)
+
+# TRIP EVENT STREAMS (server-sent events)
+# Leave EVENTS_REDIS_URL empty to use the in-process broker (single worker only)
+EVENTS_REDIS_URL = config("EVENTS_REDIS_URL", default="")
+EVENTS_HEARTBEAT_SECONDS = config("EVENTS_HEARTBEAT_SECONDS", cast=float, default=15)
+EVENTS_QUEUE_SIZE = config("EVENTS_QUEUE_SIZE", cast=int, default=100)
+
 # Application definition
 DJANGO_APPS = [
     "django.contrib.admin",
@@ -191,6 +219,33 @@ else:
     logger.error("No Database configured")
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+USE_REDIS_CACHE = config("USE_REDIS_CACHE", cast=bool, default=False)
+if USE_REDIS_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": f"redis://{config('REDIS_HOST', default='localhost')}:{config('REDIS_PORT', default=6379)}/1",
+        }
+    }
+else:
+    # Per process: with several workers, map tile invalidations only reach the worker
+    # that made them. Set USE_REDIS_CACHE when running more than one worker.
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+ROUTE_CACHE_TTL = config("ROUTE_CACHE_TTL", cast=int, default=86400)  # seconds
+
+# FLEET MAP (GET /api/trips/map/)
+MAP_TILE_CACHE_TTL = config("MAP_TILE_CACHE_TTL", cast=int, default=300)  # seconds
+MAP_MAX_TILES = config("MAP_MAX_TILES", cast=int, default=64)  # per request
+
+# ELD RETENTION
+# Trips older than this are moved to gzip NDJSON files by `manage.py archive_trips`
+ELD_RETENTION_DAYS = config("ELD_RETENTION_DAYS", cast=int, default=183)
+ELD_ARCHIVE_DIR = config("ELD_ARCHIVE_DIR", default=os.path.join(BASE_DIR, "archive"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FLEET_CHANNEL = "fleet"
+
+
+def trip_channel(trip_id: int) -> str:
+    return f"trip:{trip_id}"
+
+
+class Subscription:
+    """
+    A single listener's view of one or more channels.
+
+    Each subscription is just an ``asyncio.Queue`` bound to the event loop it was
+    created on, so an idle connection costs one queue and one suspended coroutine.
+    """
+
+    def __init__(self, broker: "EventBroker", channels: list[str]):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def deliver(self, event: dict) -> None:
+        """
+        Hands ``event`` to the subscriber's loop. Safe to call from any thread.
+
+        A subscriber whose loop has closed (its connection is gone without having
+        unsubscribed) is dropped instead of failing the publisher.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            logger.warning(f"Dropping subscriber on {self.channels}: its event loop is closed")
+            self.broker.unsubscribe(self)
+
+    def _put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping event for slow subscriber on {self.channels}")
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        """
+        Waits for the next event, returning None if ``timeout`` elapses first.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """
+    In-process pub/sub for trip events.
+
+    Publishers are the synchronous trip-processing code; subscribers are async
+    streaming views. Events only reach subscribers in the same process, which is
+    enough for a single ASGI worker. Use ``RedisEventBroker`` to fan out across
+    workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, channels: list[str]) -> Subscription:
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for channel in subscription.channels:
+                listeners = self._subscribers.get(channel)
+                if listeners is None:
+                    continue
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._subscribers[channel]
+
+    def publish(self, channel: str, event: dict) -> None:
+        self.dispatch(channel, event)
+
+    def dispatch(self, channel: str, event: dict) -> None:
+        """
+        Delivers ``event`` to the subscribers of ``channel`` in this process.
+        """
+        with self._lock:
+            listeners = list(self._subscribers.get(channel, ()))
+        for subscription in listeners:
+            subscription.deliver(event)
+
+
+class RedisEventBroker(EventBroker):
+    """
+    Event broker that publishes through Redis so every worker sees every event.
+
+    Each process holds a single Redis pub/sub connection, started lazily on the
+    first subscription, and fans incoming messages out to its local subscribers.
+    A dropped connection is logged and re-established with exponential backoff.
+    """
+
+    RECONNECT_MIN_DELAY = 0.5  # seconds
+    RECONNECT_MAX_DELAY = 30  # seconds
+
+    def __init__(self, url: str, prefix: str = "eld:"):
+        super().__init__()
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._listener: asyncio.Task | None = None
+
+    def subscribe(self, channels: list[str]) -> Subscription:
+        subscription = super().subscribe(channels)
+        if self._listener is None or self._listener.done():
+            self._listener = subscription.loop.create_task(self._listen())
+        return subscription
+
+    def publish(self, channel: str, event: dict) -> None:
+        try:
+            self._client.publish(self.prefix + channel, json.dumps(event))
+        except Exception as e:
+            logger.error(f"Failed to publish event on {channel}: {e}")
+
+    async def _listen(self) -> None:
+        delay = self.RECONNECT_MIN_DELAY
+        while True:
+            try:
+                async for _ in self._receive():
+                    # Connected again; the next failure starts over from the shortest delay
+                    delay = self.RECONNECT_MIN_DELAY
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis event listener failed, reconnecting in {delay:g}s: {e}")
+            else:
+                logger.warning(f"Redis event listener closed, reconnecting in {delay:g}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+
+    async def _receive(self):
+        """
+        Subscribes to every event channel and dispatches messages until the
+        connection ends. Yields once, when the subscription is in place.
+        """
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.psubscribe(self.prefix + "*")
+            yield
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"].decode()[len(self.prefix) :]
+                self.dispatch(channel, json.loads(message["data"]))
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker: EventBroker | None = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> EventBroker:
+    """
+    Returns the process-wide broker, backed by Redis when ``EVENTS_REDIS_URL`` is set.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.EVENTS_REDIS_URL:
+                _broker = RedisEventBroker(settings.EVENTS_REDIS_URL)
+            else:
+                _broker = EventBroker()
+        return _broker
+
+
+def publish_trip_event(trip_id: int, event: str, **data) -> None:
+    """
+    Publishes a trip event to the trip's own channel and to the fleet channel.
+
+    Events are best effort: a failure is logged and never raised into the trip
+    processing code that publishes them.
+    """
+    payload = {"event": event, "trip": trip_id, **data}
+    try:
+        broker = get_broker()
+        broker.publish(trip_channel(trip_id), payload)
+        broker.publish(FLEET_CHANNEL, payload)
+    except Exception as e:
+        logger.error(f"Failed to publish {event} event of Trip {trip_id}: {e}")
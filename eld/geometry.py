@@ -0,0 +1,153 @@
+import json
+
+import numpy as np
+from openrouteservice import convert
+
+EARTH_RADIUS = 6371008.8  # mean radius, in meters
+
+
+def parse_line_coordinates(geometry) -> np.ndarray:
+    """
+    Returns the ``(n, 2)`` array of [longitude, latitude] vertices of a route geometry.
+
+    Accepts a GeoJSON LineString (as a dict or JSON text) or an encoded polyline,
+    which is what Openrouteservice returns for ``format="json"`` requests.
+    """
+    if isinstance(geometry, str):
+        try:
+            geometry = json.loads(geometry)
+        except ValueError:
+            geometry = convert.decode_polyline(geometry)
+    coordinates = np.asarray(geometry["coordinates"], dtype=float)
+    if coordinates.ndim != 2 or len(coordinates) == 0:
+        raise ValueError("Route geometry has no coordinates.")
+    return coordinates[:, :2]
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """
+    Great-circle distance in meters between points given in degrees. Vectorized.
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+class RouteProfile:
+    """
+    Cumulative distance and driving time at every vertex of a route LineString.
+
+    The arrays are built once in O(n); any number of points along the route can
+    then be located by distance or by driving time with a binary search and a
+    linear interpolation each.
+    """
+
+    def __init__(self, coordinates, duration_seconds: float, steps=None):
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        lon, lat = self.coordinates[:, 0], self.coordinates[:, 1]
+        self.distances = np.zeros(len(self.coordinates))
+        np.cumsum(haversine(lon[:-1], lat[:-1], lon[1:], lat[1:]), out=self.distances[1:])
+        self.times = self._driving_times(float(duration_seconds), steps)
+
+    @classmethod
+    def from_route_info(cls, route_info: dict) -> "RouteProfile":
+        return cls(
+            parse_line_coordinates(route_info["geometry"]),
+            route_info["duration_seconds"],
+            steps=route_info.get("waypoints"),
+        )
+
+    @property
+    def total_distance(self) -> float:
+        return float(self.distances[-1])
+
+    @property
+    def total_duration(self) -> float:
+        return float(self.times[-1])
+
+    def _driving_times(self, duration_seconds, steps):
+        total_distance = self.distances[-1]
+        if total_distance <= 0:
+            return np.zeros_like(self.distances)
+
+        # Openrouteservice steps give the duration between two vertex indices; spread
+        # each step's duration over its vertices in proportion to distance.
+        if steps:
+            ends = np.array([step["way_points"][1] for step in steps], dtype=int)
+            ends = np.clip(ends, 0, len(self.distances) - 1)
+            step_times = np.cumsum([step["duration"] for step in steps], dtype=float)
+            knots = np.concatenate(([0.0], self.distances[ends]))
+            knot_times = np.concatenate(([0.0], step_times))
+            order = np.argsort(knots, kind="stable")
+            return np.interp(self.distances, knots[order], knot_times[order])
+
+        return self.distances / total_distance * duration_seconds
+
+    def distance_at_time(self, seconds):
+        return np.interp(seconds, self.times, self.distances)
+
+    def time_at_distance(self, meters):
+        return np.interp(meters, self.distances, self.times)
+
+    def locate_distance(self, meters) -> np.ndarray:
+        """
+        Returns the [longitude, latitude] of the points at the given route distances.
+        """
+        return self._locate(self.distances, np.atleast_1d(np.asarray(meters, dtype=float)))
+
+    def locate_time(self, seconds) -> np.ndarray:
+        """
+        Returns the [longitude, latitude] of the points reached after the given driving times.
+        """
+        return self.locate_distance(self.distance_at_time(np.asarray(seconds, dtype=float)))
+
+    def _locate(self, values, targets):
+        if len(values) == 1:
+            return np.repeat(self.coordinates, len(targets), axis=0)
+        index = np.searchsorted(values, targets, side="right") - 1
+        index = np.clip(index, 0, len(values) - 2)
+        span = values[index + 1] - values[index]
+        fraction = np.divide(
+            targets - values[index], span, out=np.zeros_like(targets), where=span > 0
+        )
+        fraction = np.clip(fraction, 0.0, 1.0)[:, None]
+        start = self.coordinates[index]
+        return start + fraction * (self.coordinates[index + 1] - start)
+
+
+def simplify(coordinates, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of a LineString, with ``tolerance`` in the units
+    of the coordinates (degrees for lon/lat). The first and last vertices are kept.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    if len(coordinates) < 3:
+        return coordinates
+
+    keep = np.zeros(len(coordinates), dtype=bool)
+    keep[[0, -1]] = True
+    # Iterative, so long routes cannot hit the recursion limit
+    stack = [(0, len(coordinates) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = coordinates[start], coordinates[end]
+        points = coordinates[start + 1 : end]
+        segment = b - a
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(*(points - a).T)
+        else:
+            offsets = points - a
+            cross = segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]
+            distances = np.abs(cross) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.extend([(start, index), (index, end)])
+    return coordinates[keep]
@@ -0,0 +1,203 @@
+"""
+Hours of Service (HOS) rules for a property-carrying driver on the 70-hour/8-day cycle.
+
+All durations are in seconds unless the name says otherwise.
+"""
+
+from decimal import Decimal
+
+import numpy as np
+
+HOUR = 3600
+MILE = 1609.344  # in meters
+
+MAX_DRIVING = 11 * HOUR  # Driving allowed after 10 consecutive hours off duty
+DUTY_WINDOW = 14 * HOUR  # No driving after the 14th hour since coming on duty
+BREAK_AFTER_DRIVING = 8 * HOUR  # Cumulative driving that requires a 30-minute break
+BREAK_DURATION = HOUR // 2
+REST_DURATION = 10 * HOUR
+CYCLE_LIMIT_HOURS = 70
+CYCLE_DAYS = 8
+RESTART_DURATION = 34 * HOUR  # Off-duty period that resets the 70-hour cycle
+FUEL_INTERVAL = 1000 * MILE  # Fuel at least once every 1,000 miles
+FUEL_DURATION = HOUR // 2
+PICKUP_DURATION = HOUR
+DROPOFF_DURATION = HOUR
+
+# Off-duty stops that count towards the driver's rest, not the cycle
+REST_STOPS = {"break", "rest", "restart"}
+
+
+def plan_trip(driving_seconds: float, cycle_used_hours: float | Decimal = 0, fuel_at=()) -> dict:
+    """
+    Lays out a trip's duty periods under the HOS rules.
+
+    The trip starts with the pickup, drives with the breaks, 10-hour rests and
+    34-hour restarts the rules require, fuels at the given points and ends with
+    the dropoff.
+
+    Args:
+        driving_seconds: Total driving time of the route.
+        cycle_used_hours: On-duty hours already used in the current 70-hour cycle.
+        fuel_at: Driving times, in ascending order, at which a fuel stop is due.
+
+    Returns:
+        A dictionary with the en-route ``stops`` (type, driving time and trip
+        offset at which each starts, and its duration), the ``total_seconds`` from
+        pickup to the end of the dropoff and the ``on_duty_seconds`` it uses.
+    """
+    stops = []
+    fuel_at = [offset for offset in fuel_at if 0 < offset < driving_seconds]
+    cycle_left = CYCLE_LIMIT_HOURS * HOUR - float(cycle_used_hours) * HOUR
+
+    elapsed = float(PICKUP_DURATION)
+    on_duty = float(PICKUP_DURATION)
+    cycle_left -= PICKUP_DURATION
+    window_start = 0.0
+    shift_driving = 0.0
+    since_break = 0.0
+    driven = 0.0
+
+    def add_stop(stop_type, duration):
+        stops.append(
+            {
+                "type": stop_type,
+                "driving_seconds": driven,
+                "offset_seconds": elapsed,
+                "duration_seconds": duration,
+            }
+        )
+        return elapsed + duration
+
+    while driven < driving_seconds:
+        if cycle_left <= 0:
+            elapsed = add_stop("restart", RESTART_DURATION)
+            cycle_left = CYCLE_LIMIT_HOURS * HOUR
+            window_start, shift_driving, since_break = elapsed, 0.0, 0.0
+            continue
+        if shift_driving >= MAX_DRIVING or elapsed - window_start >= DUTY_WINDOW:
+            elapsed = add_stop("rest", REST_DURATION)
+            window_start, shift_driving, since_break = elapsed, 0.0, 0.0
+            continue
+        if since_break >= BREAK_AFTER_DRIVING:
+            elapsed = add_stop("break", BREAK_DURATION)
+            since_break = 0.0
+            continue
+
+        chunk = min(
+            driving_seconds - driven,
+            MAX_DRIVING - shift_driving,
+            window_start + DUTY_WINDOW - elapsed,
+            BREAK_AFTER_DRIVING - since_break,
+            cycle_left,
+        )
+        if fuel_at:
+            chunk = min(chunk, fuel_at[0] - driven)
+        driven += chunk
+        elapsed += chunk
+        on_duty += chunk
+        shift_driving += chunk
+        since_break += chunk
+        cycle_left -= chunk
+
+        if fuel_at and driven >= fuel_at[0]:
+            fuel_at.pop(0)
+            elapsed = add_stop("fuel", FUEL_DURATION)
+            on_duty += FUEL_DURATION
+            cycle_left -= FUEL_DURATION
+            # 30 consecutive minutes not driving also satisfies the break rule
+            since_break = 0.0
+
+    elapsed += DROPOFF_DURATION
+    on_duty += DROPOFF_DURATION
+    return {"stops": stops, "total_seconds": elapsed, "on_duty_seconds": on_duty}
+
+
+def evaluate_batch(driving_seconds: float, cycle_used_hours, fuel_at=()) -> dict:
+    """
+    Evaluates ``plan_trip`` for many starting cycle values at once.
+
+    Every scenario follows the same rules as ``plan_trip``; each loop iteration
+    advances all unfinished scenarios by one duty period with NumPy masks, so the
+    number of iterations is bounded by the number of stops on the longest plan,
+    not by the number of scenarios.
+
+    Returns:
+        A dictionary of arrays aligned with ``cycle_used_hours``: ``total_seconds``,
+        ``on_duty_seconds`` and the ``rests``, ``breaks``, ``restarts`` and ``fuel_stops``
+        counts.
+    """
+    cycle_used = np.asarray(cycle_used_hours, dtype=float)
+    fuel = np.array(sorted(t for t in fuel_at if 0 < t < driving_seconds) + [np.inf])
+    zeros = np.zeros_like(cycle_used)
+
+    cycle_left = CYCLE_LIMIT_HOURS * HOUR - cycle_used * HOUR - PICKUP_DURATION
+    elapsed = zeros + PICKUP_DURATION
+    on_duty = zeros + PICKUP_DURATION
+    window_start = zeros.copy()
+    shift_driving = zeros.copy()
+    since_break = zeros.copy()
+    driven = zeros.copy()
+    next_fuel = np.zeros(cycle_used.shape, dtype=int)
+    counts = {
+        name: np.zeros(cycle_used.shape, dtype=int) for name in ("rests", "breaks", "restarts")
+    }
+
+    while True:
+        active = driven < driving_seconds
+        if not active.any():
+            break
+        restart = active & (cycle_left <= 0)
+        rest = (
+            active
+            & ~restart
+            & ((shift_driving >= MAX_DRIVING) | (elapsed - window_start >= DUTY_WINDOW))
+        )
+        take_break = active & ~restart & ~rest & (since_break >= BREAK_AFTER_DRIVING)
+        drive = active & ~restart & ~rest & ~take_break
+
+        # Off-duty periods
+        elapsed += np.where(restart, RESTART_DURATION, 0) + np.where(rest, REST_DURATION, 0)
+        elapsed += np.where(take_break, BREAK_DURATION, 0)
+        cycle_left = np.where(restart, CYCLE_LIMIT_HOURS * HOUR, cycle_left)
+        new_shift = restart | rest
+        window_start = np.where(new_shift, elapsed, window_start)
+        shift_driving = np.where(new_shift, 0.0, shift_driving)
+        since_break = np.where(new_shift | take_break, 0.0, since_break)
+        counts["restarts"] += restart
+        counts["rests"] += rest
+        counts["breaks"] += take_break
+
+        # Driving up to the next limit or fuel stop
+        fuel_due = fuel[next_fuel]
+        chunk = np.minimum.reduce(
+            [
+                driving_seconds - driven,
+                MAX_DRIVING - shift_driving,
+                window_start + DUTY_WINDOW - elapsed,
+                BREAK_AFTER_DRIVING - since_break,
+                cycle_left,
+                fuel_due - driven,
+            ]
+        )
+        chunk = np.where(drive, chunk, 0.0)
+        driven += chunk
+        elapsed += chunk
+        on_duty += chunk
+        shift_driving += chunk
+        since_break += chunk
+        cycle_left -= chunk
+
+        fueled = drive & (driven >= fuel_due)
+        next_fuel += fueled
+        elapsed += np.where(fueled, FUEL_DURATION, 0)
+        on_duty += np.where(fueled, FUEL_DURATION, 0)
+        cycle_left -= np.where(fueled, FUEL_DURATION, 0)
+        since_break = np.where(fueled, 0.0, since_break)
+
+    return {
+        "total_seconds": elapsed + DROPOFF_DURATION,
+        "on_duty_seconds": on_duty + DROPOFF_DURATION,
+        "fuel_stops": next_fuel,
+        **counts,
+    }
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from eld.models import Trip
+from eld.services import ArchiveService
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves trips and ELD logs older than the retention horizon to gzip NDJSON "
+        "archive files, or restores an archive with --rehydrate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.ELD_RETENTION_DAYS,
+            help="Archive trips created more than this many days ago "
+            f"(default: ELD_RETENTION_DAYS, {settings.ELD_RETENTION_DAYS}).",
+        )
+        parser.add_argument(
+            "--output-dir",
+            default=settings.ELD_ARCHIVE_DIR,
+            help="Directory for archive files (default: ELD_ARCHIVE_DIR).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Trips read and deleted per batch."
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report how many trips would be archived."
+        )
+        parser.add_argument(
+            "--rehydrate", metavar="PATH", help="Restore the trips and logs of an archive file."
+        )
+
+    def handle(self, *args, **options):
+        service = ArchiveService(options["output_dir"])
+
+        if options["rehydrate"]:
+            try:
+                trips, logs = service.rehydrate(options["rehydrate"])
+            except FileNotFoundError as e:
+                raise CommandError(f"Archive not found: {options['rehydrate']}") from e
+            self.stdout.write(self.style.SUCCESS(f"Rehydrated {trips} trips and {logs} ELD logs."))
+            return
+
+        if options["older_than_days"] < 0:
+            raise CommandError("--older-than-days must not be negative.")
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+
+        if options["dry_run"]:
+            count = Trip.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f"{count} trips created before {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        archive = service.archive(cutoff, batch_size=options["batch_size"])
+        if archive is None:
+            self.stdout.write(f"No trips created before {cutoff:%Y-%m-%d}; nothing to archive.")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archive.trip_count} trips and {archive.log_count} ELD logs "
+                f"to {archive.path}"
+            )
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from eld.models import Trip
+from eld.services import RouteStepsService
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the legacy Trip.route_waypoints of existing trips into their columnar "
+        "TripRouteSteps row, then clears the legacy column."
+    )
+
+    def handle(self, *args, **options):
+        trips = Trip.objects.filter(route_waypoints__isnull=False)
+
+        service = RouteStepsService()
+        count = 0
+        for trip in trips.iterator(chunk_size=500):
+            with transaction.atomic():
+                service.store(trip, trip.route_waypoints or [])
+                Trip.objects.filter(pk=trip.pk).update(route_waypoints=None)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Backfilled the route steps of {count} trips."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from eld.models import Trip
+from eld.services import MapService
+
+
+class Command(BaseCommand):
+    help = "Builds the fleet map points and simplified route shapes of existing trips."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild every trip, not only trips without map points.",
+        )
+
+    def handle(self, *args, **options):
+        trips = Trip.objects.all()
+        if not options["all"]:
+            trips = trips.filter(map_points__isnull=True)
+
+        service = MapService()
+        count = 0
+        for trip in trips.distinct().iterator(chunk_size=500):
+            service.index_trip(trip)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} trips for the fleet map."))
@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+OPERATIONS = ("create", "retrieve", "logs")
+
+
+def random_location(rng: random.Random) -> dict:
+    # Somewhere in the contiguous United States
+    return {
+        "latitude": round(rng.uniform(30.0, 47.0), 4),
+        "longitude": round(rng.uniform(-120.0, -75.0), 4),
+    }
+
+
+def summarize(results, elapsed: float) -> list[dict]:
+    """
+    Aggregates ``(operation, status_code, latency_seconds)`` results per operation.
+    A status code of 0 stands for a request that raised (timeout, refused...).
+    """
+    summary = []
+    for operation in OPERATIONS:
+        rows = [row for row in results if row[0] == operation]
+        if not rows:
+            continue
+        latencies = np.array([row[2] for row in rows]) * 1000
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        summary.append(
+            {
+                "operation": operation,
+                "requests": len(rows),
+                "errors": sum(1 for row in rows if not 200 <= row[1] < 300),
+                "throughput": len(rows) / elapsed if elapsed else 0.0,
+                "p50": p50,
+                "p90": p90,
+                "p99": p99,
+                "max": latencies.max(),
+            }
+        )
+    return summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives /api/trips/, /api/trips/<pk>/ and /api/trips/<pk>/logs/ at a given "
+        "concurrency and reports throughput and latency percentiles per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=10, help="Concurrent clients.")
+        parser.add_argument("--requests", type=int, default=200, help="Total requests to send.")
+        parser.add_argument(
+            "--mix",
+            default="create=1,retrieve=4,logs=4",
+            help="Relative weights of the create, retrieve and logs operations.",
+        )
+        parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout.")
+        parser.add_argument("--token", help="JWT access token sent as a Bearer token.")
+        parser.add_argument("--seed", type=int, help="Seed for the operation mix and payloads.")
+
+    def handle(self, *args, **options):
+        weights = self.parse_mix(options["mix"])
+        if options["concurrency"] < 1 or options["requests"] < 1:
+            raise CommandError("--concurrency and --requests must be positive.")
+
+        self.base_url = options["base_url"].rstrip("/")
+        self.timeout = options["timeout"]
+        self.headers = {"Authorization": f"Bearer {options['token']}"} if options["token"] else {}
+        self.rng = random.Random(options["seed"])
+        self.lock = threading.Lock()
+        self.remaining = options["requests"]
+        self.trip_ids: list[int] = []
+        self.results: list[tuple[str, int, float]] = []
+
+        self.stdout.write(
+            f"Sending {options['requests']} requests to {self.base_url} "
+            f"with {options['concurrency']} clients..."
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            for _ in range(options["concurrency"]):
+                executor.submit(self.client_loop, weights)
+        elapsed = time.perf_counter() - started
+
+        self.report(summarize(self.results, elapsed), elapsed)
+
+    def parse_mix(self, mix: str) -> dict:
+        try:
+            weights = {
+                name.strip(): float(weight)
+                for name, weight in (part.split("=") for part in mix.split(","))
+            }
+        except ValueError as e:
+            raise CommandError(f"Invalid --mix {mix!r}; expected e.g. create=1,logs=4.") from e
+        unknown = set(weights) - set(OPERATIONS)
+        if unknown or not any(weights.values()):
+            raise CommandError(f"--mix must weight some of {', '.join(OPERATIONS)}.")
+        return weights
+
+    def next_operation(self, weights: dict):
+        """
+        Claims one request from the budget and picks its operation, or returns None
+        when the budget is spent. Reads need a trip, so they become creates until
+        one exists.
+        """
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            operation = self.rng.choices(list(weights), weights=list(weights.values()))[0]
+            if operation != "create" and not self.trip_ids:
+                operation = "create"
+            trip_id = self.rng.choice(self.trip_ids) if self.trip_ids else None
+            payload = None
+            if operation == "create":
+                payload = {
+                    "current_location": random_location(self.rng),
+                    "pickup_location": random_location(self.rng),
+                    "dropoff_location": random_location(self.rng),
+                    "current_cycle_used": f"{self.rng.uniform(0, 60):.2f}",
+                }
+        return operation, trip_id, payload
+
+    def client_loop(self, weights: dict) -> None:
+        session = requests.Session()
+        session.headers.update(self.headers)
+        while (task := self.next_operation(weights)) is not None:
+            operation, trip_id, payload = task
+            started = time.perf_counter()
+            try:
+                if operation == "create":
+                    response = session.post(
+                        f"{self.base_url}/api/trips/", json=payload, timeout=self.timeout
+                    )
+                elif operation == "retrieve":
+                    response = session.get(
+                        f"{self.base_url}/api/trips/{trip_id}/", timeout=self.timeout
+                    )
+                else:
+                    response = session.get(
+                        f"{self.base_url}/api/trips/{trip_id}/logs/", timeout=self.timeout
+                    )
+                status_code = response.status_code
+            except requests.RequestException:
+                status_code = 0
+            latency = time.perf_counter() - started
+
+            with self.lock:
+                self.results.append((operation, status_code, latency))
+                if operation == "create" and status_code == 201:
+                    self.trip_ids.append(response.json()["id"])
+
+    def report(self, summary: list[dict], elapsed: float) -> None:
+        self.stdout.write(
+            f"\n{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>10}"
+            f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        )
+        for row in summary:
+            self.stdout.write(
+                f"{row['operation']:<10}{row['requests']:>10}{row['errors']:>8}"
+                f"{row['throughput']:>10.1f}{row['p50']:>10.1f}{row['p90']:>10.1f}"
+                f"{row['p99']:>10.1f}{row['max']:>10.1f}"
+            )
+        total = sum(row["requests"] for row in summary)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s)"
+            )
+        )
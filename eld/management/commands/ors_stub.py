@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+
+from eld.ors_stub import ORSStubServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local HTTP stub of the Openrouteservice directions endpoint with "
+        "configurable latency, errors and 429 rate limiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument("--latency-ms", type=float, default=150, help="Base response delay.")
+        parser.add_argument(
+            "--jitter-ms", type=float, default=100, help="Random extra delay, up to this much."
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0.0, help="Fraction of requests that fail."
+        )
+        parser.add_argument(
+            "--error-status", type=int, default=500, help="HTTP status of injected errors."
+        )
+        parser.add_argument(
+            "--rate-limit-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of requests answered with 429 Too Many Requests.",
+        )
+        parser.add_argument("--vertices", type=int, default=200, help="Vertices per route.")
+        parser.add_argument("--steps", type=int, default=10, help="Turn-by-turn steps per route.")
+        parser.add_argument("--seed", type=int, help="Seed for reproducible injected failures.")
+
+    def handle(self, *args, **options):
+        server = ORSStubServer(
+            (options["host"], options["port"]),
+            latency=options["latency_ms"] / 1000,
+            jitter=options["jitter_ms"] / 1000,
+            error_rate=options["error_rate"],
+            rate_limit_rate=options["rate_limit_rate"],
+            error_status=options["error_status"],
+            vertices=options["vertices"],
+            steps=options["steps"],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"ORS stub listening on {server.url}; "
+                f"set OPENROUTESERVICE_BASE_URL={server.url} to use it."
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.request_count} requests.")
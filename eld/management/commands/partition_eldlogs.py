@@ -0,0 +1,125 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from eld.models import ELDLog, Trip
+
+
+def month_start(day: date, months: int = 0) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "PostgreSQL only: range-partitions the ELD log table by month of start_time "
+        "and creates the monthly partitions ahead of time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Convert the existing ELD log table into a partitioned table (locks it "
+            "while the rows are copied).",
+        )
+        parser.add_argument(
+            "--months-ahead", type=int, default=3, help="Future monthly partitions to create."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Native partitioning is only supported on PostgreSQL.")
+
+        table = ELDLog._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+            row = cursor.fetchone()
+            if row is None:
+                raise CommandError(f"Table {table} does not exist; run migrate first.")
+
+            if row[0] != "p":
+                if not options["convert"]:
+                    raise CommandError(
+                        f"Table {table} is not partitioned. Re-run with --convert to convert it."
+                    )
+                first_month = self.convert(cursor, table)
+            else:
+                first_month = month_start(timezone.localdate())
+
+            last_month = month_start(timezone.localdate(), options["months_ahead"])
+            created = self.create_partitions(cursor, table, first_month, last_month)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{table} is partitioned; {created} partitions ready.")
+        )
+
+    def convert(self, cursor, table: str) -> date:
+        """
+        Replaces ``table`` with a partitioned copy and returns the first month to
+        create a partition for.
+        """
+        quote = connection.ops.quote_name
+        old_table = f"{table}_unpartitioned"
+        self.stdout.write(f"Converting {table} to a partitioned table...")
+
+        cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(old_table)} "
+            "INCLUDING DEFAULTS INCLUDING IDENTITY) PARTITION BY RANGE (start_time)"
+        )
+        # The partition key must be part of the primary key
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_part_pkey')} "
+            "PRIMARY KEY (id, start_time)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_part_trip_fk')} "
+            f"FOREIGN KEY (trip_id) REFERENCES {quote(Trip._meta.db_table)} (id) "
+            "DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(
+            f"CREATE INDEX {quote(table + '_part_trip_idx')} ON {quote(table)} (trip_id)"
+        )
+        cursor.execute(
+            f"CREATE INDEX {quote(table + '_part_start_idx')} ON {quote(table)} (start_time)"
+        )
+        # Rows outside every monthly partition land here instead of failing
+        cursor.execute(
+            f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT"
+        )
+
+        cursor.execute(f"SELECT MIN(start_time) FROM {quote(old_table)}")
+        oldest = cursor.fetchone()[0]
+        first_month = month_start(timezone.localdate(oldest) if oldest else timezone.localdate())
+        self.create_partitions(cursor, table, first_month, month_start(timezone.localdate(), 1))
+
+        cursor.execute(
+            f"INSERT INTO {quote(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {quote(old_table)}"
+        )
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {quote(table)}), 0) + 1, false)",
+            [table],
+        )
+        cursor.execute(f"DROP TABLE {quote(old_table)}")
+        return first_month
+
+    def create_partitions(self, cursor, table: str, first_month: date, last_month: date) -> int:
+        quote = connection.ops.quote_name
+        count = 0
+        month = first_month
+        while month <= last_month:
+            next_month = month_start(month, 1)
+            partition = f"{table}_y{month:%Y}m{month:%m}"
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(partition)} PARTITION OF {quote(table)} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [month.isoformat(), next_month.isoformat()],
+            )
+            count += 1
+            month = next_month
+        return count
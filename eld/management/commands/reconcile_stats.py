@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from eld.services import StatsService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the dashboard counters from the Trip and ELDLog tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report how many counters drifted."
+        )
+
+    def handle(self, *args, **options):
+        drift = StatsService().reconcile(dry_run=options["dry_run"])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Counters are in sync."))
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"{drift} counters have drifted."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {drift} counters."))
@@ -4,7 +4,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 
 from eld.models import Trip
-from eld.services import ELDService, RouteService
+from eld.services import DutyLedgerService, StatsService, TripProcessingService
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -20,6 +20,8 @@ class Command(BaseCommand):
 
         # Clear existing data
         self.stdout.write("Clearing existing Trip and ELDLog data...")
+        StatsService().record_trips_removed(Trip.objects.all())
+        DutyLedgerService().record_trips_removed(Trip.objects.all())
         Trip.objects.all().delete()
 
         # --- Sample Trip 1: New York to Chicago ---
@@ -45,50 +47,18 @@ class Command(BaseCommand):
 
             # Create the Trip object
             trip = Trip.objects.create(**trip_data)
+            StatsService().record_trip_created(trip)
             self.stdout.write(f"  Created Trip {trip.id} (status: {trip.status})")
 
-            # This mimics the logic from the view's create method
-            try:
-                self.stdout.write(f"  Calculating route for Trip {trip.id}...")
+            # Same processing the API runs after a trip is created
+            self.stdout.write(f"  Calculating route and ELD logs for Trip {trip.id}...")
+            TripProcessingService().process(trip)
 
-                pickup_coords = [
-                    trip.pickup_location["longitude"],
-                    trip.pickup_location["latitude"],
-                ]
-                dropoff_coords = [
-                    trip.dropoff_location["longitude"],
-                    trip.dropoff_location["latitude"],
-                ]
-
-                route_service = RouteService()
-                route_info = route_service.calculate_route(
-                    coordinates=[pickup_coords, dropoff_coords]
-                )
-
-                if route_info:
-                    trip.route_geometry = route_info["geometry"]
-                    trip.route_waypoints = route_info["waypoints"]
-
-                    self.stdout.write("  Route calculated. Generating ELD logs...")
-                    eld_service = ELDService()
-                    eld_service.generate_eld_logs(trip, route_info)
-
-                    trip.status = "processed"
-                    self.stdout.write(
-                        self.style.SUCCESS(f"  Successfully processed Trip {trip.id}")
-                    )
-                else:
-                    trip.status = "error_no_route"
-                    self.stdout.write(
-                        self.style.WARNING(f"  Could not find route for Trip {trip.id}")
-                    )
-
-                trip.save()
-
-            except Exception as e:
-                logger.error(f"An error occurred while processing Trip {trip.id}: {e}")
-                trip.status = "error_processing"
-                trip.save()
+            if trip.status == "processed":
+                self.stdout.write(self.style.SUCCESS(f"  Successfully processed Trip {trip.id}"))
+            elif trip.status == "error_no_route":
+                self.stdout.write(self.style.WARNING(f"  Could not find route for Trip {trip.id}"))
+            else:
                 self.stdout.write(self.style.ERROR(f"  Failed to process Trip {trip.id}"))
 
         self.stdout.write(self.style.SUCCESS("Database seeding completed successfully!"))
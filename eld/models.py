@@ -1,6 +1,41 @@
 from django.db import models
 
 
+class Driver(models.Model):
+    """
+    Represents a driver whose trips share a 70-hour/8-day HOS cycle.
+    """
+
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class DriverDutyDay(models.Model):
+    """
+    On-duty time (driving included) of a driver on one calendar day.
+
+    Rows are updated incrementally as ELD logs are written, so the rolling
+    8-day cycle total is a sum over at most eight indexed rows.
+    """
+
+    driver = models.ForeignKey(Driver, related_name="duty_days", on_delete=models.CASCADE)
+    day = models.DateField()
+    on_duty_seconds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["driver", "day"], name="unique_driver_duty_day"),
+        ]
+        ordering = ["day"]
+
+    def __str__(self):
+        return f"{self.driver} on {self.day}: {self.on_duty_seconds}s on duty"
+
+
 class Trip(models.Model):
     """
     Represents a single trip with its details.
@@ -15,16 +50,29 @@ class Trip(models.Model):
     ]
 
     status = models.CharField(max_length=30, choices=TRIP_STATUS_CHOICES, default="pending")
+    driver = models.ForeignKey(
+        Driver, related_name="trips", on_delete=models.SET_NULL, blank=True, null=True
+    )
     current_location = models.JSONField()
     pickup_location = models.JSONField()
     dropoff_location = models.JSONField()
-    current_cycle_used = models.DecimalField(max_digits=4, decimal_places=2, help_text="in hours")
+    current_cycle_used = models.DecimalField(
+        max_digits=4,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        help_text="in hours; derived from the driver's duty ledger when omitted",
+    )
     route_geometry = models.TextField(
         blank=True, null=True, help_text="GeoJSON LineString of the calculated route"
     )
+    # Legacy raw steps, superseded by TripRouteSteps; kept until backfill_route_steps has run
     route_waypoints = models.JSONField(
         blank=True, null=True, help_text="Array of waypoints in the calculated route"
     )
+    route_stops = models.JSONField(
+        blank=True, null=True, help_text="Rests, breaks and fuel stops placed along the route"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -41,6 +89,35 @@ class Trip(models.Model):
         return f"Trip from {self.pickup_location} to {self.dropoff_location}"
 
 
+class TripRouteSteps(models.Model):
+    """
+    Turn-by-turn steps of a trip's route, stored column by column.
+
+    Each field is a parallel array with one entry per step, and the instruction and
+    street name texts are interned: ``instructions`` and ``names`` hold each distinct
+    string once and the ``*_ids`` arrays index into them. Kept out of ``Trip`` so
+    trip reads and writes do not carry the steps.
+    """
+
+    trip = models.OneToOneField(
+        Trip, related_name="route_steps", on_delete=models.CASCADE, primary_key=True
+    )
+    count = models.PositiveIntegerField()
+    distances = models.JSONField(help_text="Step distances, in meters")
+    durations = models.JSONField(help_text="Step durations, in seconds")
+    types = models.JSONField(help_text="Openrouteservice instruction types")
+    way_points = models.JSONField(
+        help_text="Flattened [start, end] geometry vertex indices of every step"
+    )
+    instruction_ids = models.JSONField()
+    instructions = models.JSONField(help_text="Distinct instruction strings")
+    name_ids = models.JSONField()
+    names = models.JSONField(help_text="Distinct street names")
+
+    def __str__(self):
+        return f"{self.count} route steps of trip {self.trip_id}"
+
+
 class ELDLog(models.Model):
     """
     Represents a single ELD log event.
@@ -72,3 +149,126 @@ class ELDLog(models.Model):
 
     def __str__(self):
         return f"{self.trip}: {self.status} from {self.start_time} to {self.end_time}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stores the response of a request made with an ``Idempotency-Key`` header so
+    that retries of the same request can be replayed instead of re-processed.
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64, help_text="SHA-256 of the request body")
+    status_code = models.PositiveSmallIntegerField(
+        blank=True, null=True, help_text="Empty while the first request is still in progress"
+    )
+    response_body = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+
+    @property
+    def is_complete(self):
+        return self.status_code is not None
+
+    def __str__(self):
+        return f"Idempotency key {self.key}"
+
+
+class TripArchive(models.Model):
+    """
+    A gzip NDJSON file of trips (with their ELD logs) moved out of the online tables.
+    """
+
+    path = models.CharField(max_length=500, unique=True)
+    trip_count = models.PositiveIntegerField()
+    log_count = models.PositiveIntegerField()
+    oldest_trip_at = models.DateTimeField()
+    newest_trip_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    rehydrated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Archive of {self.trip_count} trips at {self.path}"
+
+
+class TripMapPoint(models.Model):
+    """
+    Pickup or dropoff point of a trip, with indexed coordinates for map bbox queries.
+    """
+
+    KIND_CHOICES = [
+        ("pickup", "Pickup"),
+        ("dropoff", "Dropoff"),
+    ]
+
+    trip = models.ForeignKey(Trip, related_name="map_points", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    longitude = models.FloatField()
+    latitude = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["longitude", "latitude"]),
+        ]
+
+    def __str__(self):
+        return f"{self.trip_id} {self.kind} at ({self.longitude}, {self.latitude})"
+
+
+class TripRouteShape(models.Model):
+    """
+    A trip's route geometry simplified for one map zoom level, with its bounding box.
+    """
+
+    trip = models.ForeignKey(Trip, related_name="route_shapes", on_delete=models.CASCADE)
+    zoom = models.PositiveSmallIntegerField()
+    coordinates = models.JSONField(help_text="Simplified [longitude, latitude] vertices")
+    min_longitude = models.FloatField()
+    min_latitude = models.FloatField()
+    max_longitude = models.FloatField()
+    max_latitude = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["trip", "zoom"], name="unique_trip_route_shape_zoom"),
+        ]
+        indexes = [
+            models.Index(fields=["zoom", "min_longitude", "max_longitude"]),
+        ]
+
+    def __str__(self):
+        return f"Route of trip {self.trip_id} at zoom {self.zoom}"
+
+
+class StatsCounter(models.Model):
+    """
+    A precomputed dashboard counter, kept per day and as an all-time total.
+
+    ``key`` is ``trips.<status>`` for the number of trips in a status or
+    ``driving_seconds`` for the time logged as driving. ``bucket`` is an ISO date
+    for daily counters or ``total``. Trips count towards the day they were created,
+    driving time towards the day its log starts.
+    """
+
+    TOTAL = "total"
+
+    key = models.CharField(max_length=50)
+    bucket = models.CharField(max_length=10)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "bucket"], name="unique_stats_counter"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} [{self.bucket}] = {self.value}"
@@ -0,0 +1,214 @@
+"""
+Local stand-in for the Openrouteservice ``directions`` endpoint, for exercising the
+real HTTP path (client retries, timeouts, concurrency) without the public API.
+
+Run it with ``python manage.py ors_stub`` and point ``OPENROUTESERVICE_BASE_URL``
+at it.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .geometry import haversine
+
+logger = logging.getLogger(__name__)
+
+TRUCK_SPEED = 24.6  # m/s, about 55 mph
+DETOUR_FACTOR = 1.2  # Road distance relative to the great-circle distance
+
+
+def encode_polyline(coordinates, precision: int = 5) -> str:
+    """
+    Encodes [longitude, latitude] pairs with the polyline algorithm, as
+    Openrouteservice does for ``format="json"`` (latitude first, 1e-5 precision).
+    """
+    factor = 10**precision
+    output = []
+    previous = (0, 0)
+    for lon, lat in coordinates:
+        current = (round(lat * factor), round(lon * factor))
+        for value, last in zip(current, previous, strict=True):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                output.append(chr((0x20 | (delta & 0x1F)) + 63))
+                delta >>= 5
+            output.append(chr(delta + 63))
+        previous = current
+    return "".join(output)
+
+
+def build_route(coordinates, vertices: int = 200, steps: int = 10) -> dict:
+    """
+    Builds a plausible ``directions`` response: a straight line between the given
+    coordinates with ``vertices`` points and ``steps`` turn-by-turn steps.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    per_leg = max(vertices // max(len(coordinates) - 1, 1), 2)
+    line = np.vstack(
+        [
+            np.linspace(start, end, per_leg, endpoint=False)
+            for start, end in zip(coordinates[:-1], coordinates[1:], strict=True)
+        ]
+        + [coordinates[-1:]]
+    )
+    lengths = haversine(line[:-1, 0], line[:-1, 1], line[1:, 0], line[1:, 1]) * DETOUR_FACTOR
+    distance = float(lengths.sum())
+
+    bounds = np.linspace(0, len(line) - 1, min(steps, len(line) - 1) + 1).astype(int)
+    step_list = []
+    for index, (start, end) in enumerate(zip(bounds[:-1], bounds[1:], strict=True)):
+        step_distance = float(lengths[start:end].sum())
+        step_list.append(
+            {
+                "distance": round(step_distance, 1),
+                "duration": round(step_distance / TRUCK_SPEED, 1),
+                "type": 11 if index == 0 else 6,
+                "instruction": "Head east" if index == 0 else "Continue straight",
+                "name": f"Stub Road {index}",
+                "way_points": [int(start), int(end)],
+            }
+        )
+    step_list.append(
+        {
+            "distance": 0.0,
+            "duration": 0.0,
+            "type": 10,
+            "instruction": "Arrive at your destination",
+            "name": "-",
+            "way_points": [len(line) - 1, len(line) - 1],
+        }
+    )
+
+    low, high = line.min(axis=0), line.max(axis=0)
+    summary = {"distance": round(distance, 1), "duration": round(distance / TRUCK_SPEED, 1)}
+    return {
+        "bbox": [*low.tolist(), *high.tolist()],
+        "routes": [
+            {
+                "summary": summary,
+                "segments": [{**summary, "steps": step_list}],
+                "bbox": [*low.tolist(), *high.tolist()],
+                "geometry": encode_polyline(line.tolist()),
+                "way_points": [0, len(line) - 1],
+            }
+        ],
+        "metadata": {"attribution": "eld-backend ORS stub", "service": "routing"},
+    }
+
+
+class ORSStubHandler(BaseHTTPRequestHandler):
+    server: "ORSStubServer"
+
+    def do_POST(self):
+        server = self.server
+        server.count_request()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        if not self.path.startswith("/v2/directions/"):
+            return self.respond(404, {"error": {"code": 404, "message": "Not found"}})
+        if not self.headers.get("Authorization"):
+            return self.respond(401, {"error": "Authorization field missing"})
+
+        server.simulate_latency()
+        outcome = server.draw_outcome()
+        if outcome == "rate_limited":
+            return self.respond(429, {"error": "Rate Limit Exceeded"})
+        if outcome == "error":
+            return self.respond(
+                server.error_status, {"error": {"code": 2099, "message": "Injected stub error"}}
+            )
+
+        try:
+            coordinates = json.loads(body)["coordinates"]
+            route = build_route(coordinates, vertices=server.vertices, steps=server.steps)
+        except (ValueError, KeyError, TypeError, IndexError):
+            return self.respond(400, {"error": {"code": 2003, "message": "Invalid coordinates"}})
+        self.respond(200, route)
+
+    def respond(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ORSStubServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering ``POST /v2/directions/<profile>/json``.
+
+    Args:
+        latency: Base response delay, in seconds.
+        jitter: Random extra delay of up to this many seconds.
+        error_rate: Fraction of requests answered with ``error_status``.
+        rate_limit_rate: Fraction of requests answered with 429 Too Many Requests.
+        seed: Seed for the random outcomes, for reproducible runs.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        error_status: int = 500,
+        vertices: int = 200,
+        steps: int = 10,
+        seed: int | None = None,
+    ):
+        super().__init__(address, ORSStubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.error_status = error_status
+        self.vertices = vertices
+        self.steps = steps
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.request_count += 1
+
+    def simulate_latency(self) -> None:
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def draw_outcome(self) -> str:
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            return "rate_limited"
+        if draw < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def start_in_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
@@ -1,6 +1,27 @@
+from decimal import Decimal
+
+from django.utils import timezone
 from rest_framework import serializers
 
-from .models import ELDLog, Trip
+from .models import Driver, ELDLog, Trip
+from .services import DutyLedgerService
+
+
+class DriverSerializer(serializers.ModelSerializer):
+    cycle_used_hours = serializers.SerializerMethodField(
+        help_text="On-duty hours in the rolling 70-hour/8-day cycle"
+    )
+
+    class Meta:
+        model = Driver
+        fields = ["id", "name", "cycle_used_hours", "created_at", "updated_at"]
+        read_only_fields = ["created_at", "updated_at"]
+
+    def get_cycle_used_hours(self, obj) -> Decimal:
+        # The driver views annotate the cycle so a list is a single query
+        if hasattr(obj, "cycle_on_duty_seconds"):
+            return DutyLedgerService.to_cycle_hours(obj.cycle_on_duty_seconds)
+        return DutyLedgerService().cycle_used_hours(obj.id)
 
 
 class TripSerializer(serializers.ModelSerializer):
@@ -9,24 +30,34 @@ class TripSerializer(serializers.ModelSerializer):
         fields = [
             "id",
             "status",
+            "driver",
             "current_location",
             "pickup_location",
             "dropoff_location",
             "current_cycle_used",
             "route_geometry",
-            "route_waypoints",
+            "route_stops",
             "created_at",
             "updated_at",
         ]
         read_only_fields = [
             "status",
             "route_geometry",
-            "route_waypoints",
+            "route_stops",
             "created_at",
             "updated_at",
         ]
 
 
+class RouteStepSerializer(serializers.Serializer):
+    distance = serializers.FloatField(help_text="in meters")
+    duration = serializers.FloatField(help_text="in seconds")
+    type = serializers.IntegerField()
+    instruction = serializers.CharField()
+    name = serializers.CharField(allow_blank=True)
+    way_points = serializers.ListField(child=serializers.IntegerField())
+
+
 class ELDLogSerializer(serializers.ModelSerializer):
     duration = serializers.DurationField(read_only=True)
 
@@ -42,3 +73,90 @@ class ELDLogSerializer(serializers.ModelSerializer):
             "comment",
         ]
         read_only_fields = ["trip"]
+
+
+class LocationSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class TripSimulationSerializer(serializers.Serializer):
+    """
+    Input of a "what-if" simulation: one route and a grid of departure times x cycle values.
+    """
+
+    MAX_SCENARIOS = 500
+
+    pickup_location = LocationSerializer()
+    dropoff_location = LocationSerializer()
+    driver = serializers.PrimaryKeyRelatedField(
+        queryset=Driver.objects.all(),
+        required=False,
+        help_text="Used to derive the cycle from the duty ledger when current_cycle_used is omitted",
+    )
+    departure_times = serializers.ListField(
+        child=serializers.DateTimeField(), min_length=1, required=False
+    )
+    current_cycle_used = serializers.ListField(
+        child=serializers.DecimalField(max_digits=4, decimal_places=2, min_value=0, max_value=70),
+        min_length=1,
+        required=False,
+        help_text="Cycle hours already used, in hours",
+    )
+
+    def validate(self, attrs):
+        attrs.setdefault("departure_times", [timezone.now()])
+        scenarios = len(attrs["departure_times"]) * len(attrs.get("current_cycle_used", [None]))
+        if scenarios > self.MAX_SCENARIOS:
+            raise serializers.ValidationError(
+                f"At most {self.MAX_SCENARIOS} scenarios can be simulated at once, got {scenarios}."
+            )
+        return attrs
+
+
+class TripSimulationScenarioSerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    current_cycle_used = serializers.DecimalField(max_digits=4, decimal_places=2)
+    eta = serializers.DateTimeField()
+    total_on_duty_hours = serializers.FloatField()
+    rest_count = serializers.IntegerField()
+    break_count = serializers.IntegerField()
+    restart_count = serializers.IntegerField()
+    fuel_stop_count = serializers.IntegerField()
+
+
+class TripSimulationResultSerializer(serializers.Serializer):
+    distance_meters = serializers.FloatField()
+    driving_seconds = serializers.FloatField()
+    scenarios = TripSimulationScenarioSerializer(many=True)
+
+
+class StatsBucketSerializer(serializers.Serializer):
+    trip_count = serializers.IntegerField()
+    trips_by_status = serializers.DictField(child=serializers.IntegerField())
+    driving_hours = serializers.FloatField()
+
+
+class StatsDaySerializer(StatsBucketSerializer):
+    date = serializers.DateField()
+
+
+class StatsSerializer(serializers.Serializer):
+    totals = StatsBucketSerializer(help_text="All-time counters")
+    days = StatsDaySerializer(many=True, help_text="Daily counters, most recent first")
+
+
+class TripMapQuerySerializer(serializers.Serializer):
+    bbox = serializers.CharField(help_text="min_lon,min_lat,max_lon,max_lat")
+    zoom = serializers.IntegerField(min_value=0, max_value=20)
+
+    def validate_bbox(self, value):
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(","))
+        except ValueError as e:
+            raise serializers.ValidationError(
+                "Expected four comma-separated numbers: min_lon,min_lat,max_lon,max_lat."
+            ) from e
+        if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+            raise serializers.ValidationError("Invalid bounding box.")
+        return min_lon, min_lat, max_lon, max_lat
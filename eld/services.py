@@ -1,10 +1,42 @@
+import gzip
+import hashlib
+import json
 import logging
-from datetime import timedelta
+import time
+import uuid
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import cast
 
+import numpy as np
 import openrouteservice  # type ignore
 from decouple import config
+from django.conf import settings
+from django.core import serializers
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
-from .models import ELDLog, Trip
+from . import hos
+from .events import publish_trip_event
+from .geometry import RouteProfile, parse_line_coordinates, simplify
+from .models import (
+    Driver,
+    DriverDutyDay,
+    ELDLog,
+    IdempotencyKey,
+    StatsCounter,
+    Trip,
+    TripArchive,
+    TripMapPoint,
+    TripRouteShape,
+    TripRouteSteps,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +47,16 @@ class RouteService:
         if not self.api_key:
             logger.error("OPENROUTESERVICE_API_KEY not found in environment variables.")
             raise ValueError("Openrouteservice API key is not configured.")
-        self.client = openrouteservice.Client(key=self.api_key)
+        self.client = openrouteservice.Client(
+            key=self.api_key,
+            # Point at a local stub (manage.py ors_stub) to test without the public API
+            base_url=config(
+                "OPENROUTESERVICE_BASE_URL", default="https://api.openrouteservice.org"
+            ),
+            timeout=config("OPENROUTESERVICE_TIMEOUT", cast=float, default=60),
+            # Total time spent retrying 503 and 429 responses
+            retry_timeout=config("OPENROUTESERVICE_RETRY_TIMEOUT", cast=float, default=60),
+        )
 
     def calculate_route(self, coordinates: list[list[float]]):
         """
@@ -27,8 +68,27 @@ class RouteService:
 
         Returns:
             A dictionary containing route details (distance, duration, geometry)
-            or None if the route calculation fails.
+            or None if the route calculation fails. Successful routes are cached for
+            ``ROUTE_CACHE_TTL`` seconds.
         """
+        cache_key = self.cache_key(coordinates)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        route_info = self._request_route(coordinates)
+        if route_info:
+            cache.set(cache_key, route_info, settings.ROUTE_CACHE_TTL)
+        return route_info
+
+    @staticmethod
+    def cache_key(coordinates: list[list[float]]) -> str:
+        # ~1 m precision, so repeated requests for the same places share a route
+        rounded = [[round(float(value), 5) for value in point] for point in coordinates]
+        digest = hashlib.sha256(json.dumps(rounded).encode()).hexdigest()
+        return f"route:driving-hgv:{digest}"
+
+    def _request_route(self, coordinates: list[list[float]]):
         try:
             # Request route for a truck profile
             # 'truck' profile considers factors like truck restrictions, speed limits etc.
@@ -126,4 +186,1072 @@ class ELDService:
                 comment="End of trip, off duty",
             )
         )
-        return ELDLog.objects.bulk_create(logs)
+        with transaction.atomic():
+            created = ELDLog.objects.bulk_create(logs)
+            if trip.driver_id:
+                DutyLedgerService().record_logs(trip.driver_id, created)
+            StatsService().record_logs(created)
+        return created
+
+
+class DutyLedgerService:
+    """
+    Service to maintain each driver's per-day on-duty ledger and answer rolling
+    70-hour/8-day cycle lookups from it.
+    """
+
+    ON_DUTY_STATUSES = {"driving", "on_duty"}
+
+    def record_logs(self, driver_id: int, logs, sign: int = 1) -> None:
+        """
+        Adds (or, with ``sign=-1``, removes) the on-duty time of ``logs`` to the
+        driver's ledger, splitting logs that cross midnight between the days they cover.
+        """
+        seconds_per_day: dict = defaultdict(int)
+        for log in logs:
+            if log.status not in self.ON_DUTY_STATUSES:
+                continue
+            start, end = timezone.localtime(log.start_time), timezone.localtime(log.end_time)
+            while start < end:
+                next_midnight = timezone.make_aware(
+                    datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
+                )
+                chunk_end = min(end, next_midnight)
+                seconds_per_day[start.date()] += round((chunk_end - start).total_seconds())
+                start = chunk_end
+
+        with transaction.atomic():
+            for day, seconds in seconds_per_day.items():
+                if sign > 0:
+                    self._add(driver_id, day, seconds)
+                else:
+                    DriverDutyDay.objects.filter(driver_id=driver_id, day=day).update(
+                        on_duty_seconds=Greatest(F("on_duty_seconds") - seconds, 0)
+                    )
+
+    def record_trips_removed(self, trips) -> None:
+        """
+        Removes the on-duty time of a queryset of trips from their drivers' ledgers,
+        so cancelled trips stop counting against the cycle. Call it before the rows
+        are deleted, in the same transaction.
+        """
+        logs_by_driver: dict = defaultdict(list)
+        logs = ELDLog.objects.filter(
+            trip__in=trips, trip__driver__isnull=False, status__in=self.ON_DUTY_STATUSES
+        ).select_related("trip")
+        for log in logs:
+            logs_by_driver[log.trip.driver_id].append(log)
+        for driver_id, driver_logs in logs_by_driver.items():
+            self.record_logs(driver_id, driver_logs, sign=-1)
+
+    def record_trip_reassigned(self, trip, old_driver_id: int | None) -> None:
+        """
+        Moves the on-duty time of ``trip``'s logs from ``old_driver_id`` to the trip's
+        current driver. Call it in the same transaction as the driver change.
+        """
+        if trip.driver_id == old_driver_id:
+            return
+        logs = list(trip.logs.filter(status__in=self.ON_DUTY_STATUSES))
+        with transaction.atomic():
+            if old_driver_id is not None:
+                self.record_logs(old_driver_id, logs, sign=-1)
+            if trip.driver_id is not None:
+                self.record_logs(trip.driver_id, logs)
+
+    def _add(self, driver_id: int, day, seconds: int) -> None:
+        updated = DriverDutyDay.objects.filter(driver_id=driver_id, day=day).update(
+            on_duty_seconds=F("on_duty_seconds") + seconds
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                DriverDutyDay.objects.create(driver_id=driver_id, day=day, on_duty_seconds=seconds)
+        except IntegrityError:
+            # Another writer created the row first
+            self._add(driver_id, day, seconds)
+
+    def cycle_used_hours(self, driver_id: int, as_of=None) -> Decimal:
+        """
+        Returns the driver's on-duty hours over the 8 days ending on ``as_of``
+        (default: now). Reads at most eight ledger rows.
+        """
+        return self.cycle_used_hours_at(driver_id, [as_of or timezone.now()])[0]
+
+    def cycle_used_hours_at(self, driver_id: int, moments) -> list[Decimal]:
+        """
+        Returns ``cycle_used_hours`` as of each of ``moments``, reading the ledger
+        rows they span in one query.
+        """
+        days = [timezone.localdate(moment) for moment in moments]
+        seconds_per_day = dict(
+            DriverDutyDay.objects.filter(
+                driver_id=driver_id,
+                day__gt=min(days) - timedelta(days=hos.CYCLE_DAYS),
+                day__lte=max(days),
+            ).values_list("day", "on_duty_seconds")
+        )
+        return [
+            self.to_cycle_hours(
+                sum(
+                    seconds_per_day.get(day - timedelta(days=offset), 0)
+                    for offset in range(hos.CYCLE_DAYS)
+                )
+            )
+            for day in days
+        ]
+
+    def with_cycle_seconds(self, drivers, as_of=None):
+        """
+        Annotates a driver queryset with ``cycle_on_duty_seconds``, the on-duty
+        time of the 8 days ending on ``as_of``, so listing drivers takes one query.
+        """
+        today = timezone.localdate(as_of)
+        return drivers.annotate(
+            cycle_on_duty_seconds=Sum(
+                "duty_days__on_duty_seconds",
+                filter=Q(
+                    duty_days__day__gt=today - timedelta(days=hos.CYCLE_DAYS),
+                    duty_days__day__lte=today,
+                ),
+            )
+        )
+
+    @staticmethod
+    def to_cycle_hours(seconds) -> Decimal:
+        """
+        Converts ledger seconds to cycle hours. The ledger sums planned on-duty time
+        without modelling 34-hour restarts, so it can exceed the cycle; the result
+        is capped at ``CYCLE_LIMIT_HOURS``.
+        """
+        hours = min(Decimal(seconds or 0) / hos.HOUR, Decimal(hos.CYCLE_LIMIT_HOURS))
+        return hours.quantize(Decimal("0.01"))
+
+
+class StatsService:
+    """
+    Service to maintain the dashboard counters in ``StatsCounter``.
+
+    The trip and log writing paths call it inside their own transactions, so the
+    counters change exactly when the rows they count do. Reads touch a bounded
+    number of counter rows regardless of table sizes. ``manage.py reconcile_stats``
+    rebuilds the counters from the tables if they ever drift.
+    """
+
+    DRIVING_SECONDS = "driving_seconds"
+
+    @staticmethod
+    def trip_key(status: str) -> str:
+        return f"trips.{status}"
+
+    def record_trip_created(self, trip: Trip) -> None:
+        self.record_status_change(trip, None, trip.status)
+
+    def record_status_change(self, trip: Trip, old_status: str | None, new_status: str) -> None:
+        if old_status == new_status:
+            return
+        day = timezone.localdate(trip.created_at)
+        deltas: Counter = Counter({(self.trip_key(new_status), day): 1})
+        if old_status is not None:
+            deltas[(self.trip_key(old_status), day)] -= 1
+        self.apply(deltas)
+
+    def record_logs(self, logs, sign: int = 1) -> None:
+        """
+        Adds (or, with ``sign=-1``, removes) the driving time of ``logs``.
+        """
+        deltas: Counter = Counter()
+        for log in logs:
+            if log.status == "driving":
+                day = timezone.localdate(log.start_time)
+                deltas[(self.DRIVING_SECONDS, day)] += sign * round(log.duration.total_seconds())
+        self.apply(deltas)
+
+    def record_trips_removed(self, trips) -> None:
+        """
+        Removes the trips of a queryset, and the driving time of their logs, from the
+        counters. Call it before the rows are deleted, in the same transaction.
+        """
+        deltas: Counter = Counter()
+        for trip_status, created_at in trips.values_list("status", "created_at"):
+            deltas[(self.trip_key(trip_status), timezone.localdate(created_at))] -= 1
+        self.apply(deltas)
+        self.record_logs(ELDLog.objects.filter(trip__in=trips, status="driving"), sign=-1)
+
+    def apply(self, deltas: Counter) -> None:
+        """
+        Adds each ``(key, day): delta`` to its daily counter and to the key's total.
+        """
+        combined: Counter = Counter()
+        for (key, day), delta in deltas.items():
+            combined[(key, day.isoformat())] += delta
+            combined[(key, StatsCounter.TOTAL)] += delta
+
+        with transaction.atomic():
+            # Sorted, so concurrent writers lock counter rows in the same order
+            for (key, bucket), delta in sorted(combined.items()):
+                if delta:
+                    self._add(key, bucket, delta)
+
+    def _add(self, key: str, bucket: str, delta: int) -> None:
+        updated = StatsCounter.objects.filter(key=key, bucket=bucket).update(
+            value=F("value") + delta, updated_at=timezone.now()
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                StatsCounter.objects.create(key=key, bucket=bucket, value=delta)
+        except IntegrityError:
+            # Another writer created the row first
+            self._add(key, bucket, delta)
+
+    def summary(self, days: int) -> dict:
+        """
+        Returns all-time totals and the daily counters of the last ``days`` days.
+        """
+        today = timezone.localdate()
+        dates = [(today - timedelta(days=offset)).isoformat() for offset in range(days)]
+        keys = [self.trip_key(code) for code, _ in Trip.TRIP_STATUS_CHOICES]
+        values = {
+            (key, bucket): value
+            for key, bucket, value in StatsCounter.objects.filter(
+                key__in=[*keys, self.DRIVING_SECONDS], bucket__in=[StatsCounter.TOTAL, *dates]
+            ).values_list("key", "bucket", "value")
+        }
+
+        def bucket_stats(bucket):
+            trips = {
+                code: values.get((self.trip_key(code), bucket), 0)
+                for code, _ in Trip.TRIP_STATUS_CHOICES
+            }
+            return {
+                "trip_count": sum(trips.values()),
+                "trips_by_status": trips,
+                "driving_hours": round(values.get((self.DRIVING_SECONDS, bucket), 0) / hos.HOUR, 2),
+            }
+
+        return {
+            "totals": bucket_stats(StatsCounter.TOTAL),
+            "days": [{"date": date, **bucket_stats(date)} for date in dates],
+        }
+
+    def reconcile(self, dry_run: bool = False) -> int:
+        """
+        Recomputes every counter from the trip and log tables and replaces the
+        stored counters with the result.
+
+        The counters are locked before the tables are scanned, so writers that
+        commit meanwhile wait and apply their deltas on top of the rebuilt values
+        instead of being overwritten.
+
+        Returns:
+            The number of counters whose stored value was wrong.
+        """
+        with transaction.atomic():
+            stored = {
+                (key, bucket): value
+                for key, bucket, value in StatsCounter.objects.select_for_update().values_list(
+                    "key", "bucket", "value"
+                )
+            }
+            expected = self.expected_counters()
+            drift = sum(
+                1
+                for counter in stored.keys() | expected.keys()
+                if stored.get(counter, 0) != expected.get(counter, 0)
+            )
+            if drift and not dry_run:
+                StatsCounter.objects.all().delete()
+                StatsCounter.objects.bulk_create(
+                    StatsCounter(key=key, bucket=bucket, value=value)
+                    for (key, bucket), value in expected.items()
+                    if value
+                )
+        return drift
+
+    def expected_counters(self) -> Counter:
+        """
+        Returns the ``(key, bucket): value`` counters computed from the tables.
+        """
+        deltas: Counter = Counter()
+        for trip_status, created_at in Trip.objects.values_list("status", "created_at").iterator():
+            deltas[(self.trip_key(trip_status), timezone.localdate(created_at))] += 1
+        driving_logs = ELDLog.objects.filter(status="driving").values_list("start_time", "end_time")
+        for start_time, end_time in driving_logs.iterator():
+            day = timezone.localdate(start_time)
+            deltas[(self.DRIVING_SECONDS, day)] += round((end_time - start_time).total_seconds())
+
+        expected: Counter = Counter()
+        for (key, day), value in deltas.items():
+            expected[(key, day.isoformat())] += value
+            expected[(key, StatsCounter.TOTAL)] += value
+        return expected
+
+
+class RouteStepsService:
+    """
+    Service to store a route's Openrouteservice steps in columnar form and read
+    them back a page at a time.
+    """
+
+    def store(self, trip: Trip, steps: list[dict]) -> TripRouteSteps:
+        instructions: dict[str, int] = {}
+        names: dict[str, int] = {}
+        columns: dict[str, list] = {
+            "distances": [],
+            "durations": [],
+            "types": [],
+            "way_points": [],
+            "instruction_ids": [],
+            "name_ids": [],
+        }
+        for step in steps:
+            columns["distances"].append(step.get("distance", 0))
+            columns["durations"].append(step.get("duration", 0))
+            columns["types"].append(step.get("type", 0))
+            columns["way_points"].extend(step.get("way_points", [0, 0])[:2])
+            # setdefault returns the existing id of a string seen before
+            columns["instruction_ids"].append(
+                instructions.setdefault(step.get("instruction", ""), len(instructions))
+            )
+            columns["name_ids"].append(names.setdefault(step.get("name", ""), len(names)))
+
+        route_steps, _ = TripRouteSteps.objects.update_or_create(
+            trip=trip,
+            defaults={
+                "count": len(steps),
+                "instructions": list(instructions),
+                "names": list(names),
+                **columns,
+            },
+        )
+        return route_steps
+
+
+class RouteStepSequence(Sequence):
+    """
+    Read-only sequence of step dicts over a ``TripRouteSteps`` row.
+
+    Steps are only rebuilt from the columns when indexed or sliced, so paginating
+    it (DRF paginators slice their input) materializes just the requested page.
+    """
+
+    def __init__(self, route_steps: TripRouteSteps | None):
+        self.route_steps = route_steps
+
+    def __len__(self):
+        return self.route_steps.count if self.route_steps else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.step(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("step index out of range")
+        return self.step(index)
+
+    def step(self, i: int) -> dict:
+        steps = self.route_steps
+        if steps is None:
+            raise IndexError("step index out of range")
+        return {
+            "distance": steps.distances[i],
+            "duration": steps.durations[i],
+            "type": steps.types[i],
+            "instruction": steps.instructions[steps.instruction_ids[i]],
+            "name": steps.names[steps.name_ids[i]],
+            "way_points": steps.way_points[2 * i : 2 * i + 2],
+        }
+
+
+class StopPlacementService:
+    """
+    Service to place the HOS rests, 30-minute breaks and fuel stops of a trip on
+    its route geometry.
+    """
+
+    def place_stops(self, trip: Trip, route_info: dict) -> list[dict]:
+        """
+        Plans the trip's duty periods and locates every en-route stop on the route.
+
+        Returns:
+            A list of stops, each with its type, [longitude, latitude] location,
+            distance along the route, driving time and arrival time.
+        """
+        profile = RouteProfile.from_route_info(route_info)
+        driving_seconds = route_info["duration_seconds"]
+
+        plan = hos.plan_trip(
+            driving_seconds,
+            # Unset until processing derives it from the driver's ledger
+            cycle_used_hours=trip.current_cycle_used or Decimal("0.00"),
+            fuel_at=self.fuel_stop_times(profile),
+        )
+        if not plan["stops"]:
+            return []
+
+        driving_times = np.array([stop["driving_seconds"] for stop in plan["stops"]])
+        distances = profile.distance_at_time(driving_times)
+        locations = profile.locate_distance(distances)
+
+        return [
+            {
+                "type": stop["type"],
+                "location": [round(lon, 6), round(lat, 6)],
+                "distance_meters": round(float(distance), 1),
+                "driving_seconds": round(stop["driving_seconds"], 1),
+                "arrival_time": (
+                    trip.created_at + timedelta(seconds=stop["offset_seconds"])
+                ).isoformat(),
+                "duration_seconds": stop["duration_seconds"],
+            }
+            for stop, distance, (lon, lat) in zip(
+                plan["stops"], distances, locations.tolist(), strict=True
+            )
+        ]
+
+    @staticmethod
+    def fuel_stop_times(profile: RouteProfile) -> list[float]:
+        """
+        Returns the driving times at which the route passes each 1,000-mile mark.
+        """
+        fuel_distances = np.arange(hos.FUEL_INTERVAL, profile.total_distance, hos.FUEL_INTERVAL)
+        return profile.time_at_distance(fuel_distances).tolist()
+
+
+class TripSimulationService:
+    """
+    Service to compare HOS plans for one route across departure times and cycle values
+    without creating trips or ELD logs.
+    """
+
+    def simulate(
+        self, pickup_location: dict, dropoff_location: dict, departure_times, cycle_values
+    ) -> dict | None:
+        """
+        Routes the trip once (through the route cache) and evaluates every
+        departure time x cycle value scenario in a single batched HOS computation.
+
+        Args:
+            cycle_values: For each departure time, the cycle values to evaluate it with.
+
+        Returns:
+            A dictionary with the route summary and one entry per scenario, or None
+            if no route was found.
+        """
+        route_info = RouteService().calculate_route(
+            coordinates=[
+                [pickup_location["longitude"], pickup_location["latitude"]],
+                [dropoff_location["longitude"], dropoff_location["latitude"]],
+            ]
+        )
+        if not route_info:
+            return None
+
+        profile = RouteProfile.from_route_info(route_info)
+        # Departure time only shifts the plan, so evaluate each distinct cycle value once
+        unique_cycles, inverse = np.unique(
+            np.asarray([cycle for cycles in cycle_values for cycle in cycles], dtype=float),
+            return_inverse=True,
+        )
+        indices = iter(inverse.tolist())
+        results = hos.evaluate_batch(
+            route_info["duration_seconds"],
+            unique_cycles,
+            fuel_at=StopPlacementService.fuel_stop_times(profile),
+        )
+
+        scenarios = []
+        for departure_time, cycles in zip(departure_times, cycle_values, strict=True):
+            for cycle_used, index in zip(cycles, indices, strict=False):
+                scenarios.append(
+                    {
+                        "departure_time": departure_time,
+                        "current_cycle_used": cycle_used,
+                        "eta": departure_time
+                        + timedelta(seconds=float(results["total_seconds"][index])),
+                        "total_on_duty_hours": float(results["on_duty_seconds"][index]) / hos.HOUR,
+                        "rest_count": int(results["rests"][index]),
+                        "break_count": int(results["breaks"][index]),
+                        "restart_count": int(results["restarts"][index]),
+                        "fuel_stop_count": int(results["fuel_stops"][index]),
+                    }
+                )
+
+        return {
+            "distance_meters": route_info["distance_meters"],
+            "driving_seconds": route_info["duration_seconds"],
+            "scenarios": scenarios,
+        }
+
+
+class TripProcessingService:
+    """
+    Service that takes a newly created trip through routing and ELD log generation,
+    recording the outcome in ``Trip.status``.
+
+    Every status transition and the "logs ready" milestone are published to the
+    trip's event channel once the surrounding transaction commits, so streaming
+    clients do not have to poll the trip.
+    """
+
+    def process(self, trip: Trip) -> Trip:
+        # Assuming location JSONField stores {"latitude": X, "longitude": Y}
+        try:
+            pickup_coords = [trip.pickup_location["longitude"], trip.pickup_location["latitude"]]
+            dropoff_coords = [trip.dropoff_location["longitude"], trip.dropoff_location["latitude"]]
+        except (KeyError, TypeError):
+            logger.error(
+                f"Invalid location data for Trip {trip.id}. Missing 'latitude' or 'longitude'."
+            )
+            return self.set_status(trip, "error_invalid_location")
+
+        if trip.current_cycle_used is None:
+            # Derive the cycle from the driver's history instead of trusting the client
+            trip.current_cycle_used = (
+                DutyLedgerService().cycle_used_hours(trip.driver_id, as_of=trip.created_at)
+                if trip.driver_id
+                else Decimal("0.00")
+            )
+            trip.save(update_fields=["current_cycle_used", "updated_at"])
+
+        try:
+            route_service = RouteService()
+            route_info = route_service.calculate_route(coordinates=[pickup_coords, dropoff_coords])
+
+            if not route_info:
+                logger.warning(
+                    f"Could not calculate route for Trip {trip.id}. No ELD logs generated."
+                )
+                MapService().index_trip(trip)
+                return self.set_status(trip, "error_no_route")
+
+            with transaction.atomic():
+                # Store route geometry and stops for the frontend map display
+                geometry = route_info["geometry"]
+                trip.route_geometry = (
+                    geometry if isinstance(geometry, str) else json.dumps(geometry)
+                )
+                trip.route_stops = StopPlacementService().place_stops(trip, route_info)
+                trip.save(update_fields=["route_geometry", "route_stops", "updated_at"])
+                # Turn-by-turn steps live in their own columnar row
+                RouteStepsService().store(trip, route_info["waypoints"])
+
+                logs = ELDService().generate_eld_logs(trip, route_info)
+                logger.info(f"ELD logs generated for Trip {trip.id}")
+                transaction.on_commit(
+                    lambda: publish_trip_event(trip.id, "logs_ready", count=len(logs))
+                )
+                MapService().index_trip(trip)
+                return self.set_status(trip, "processed")
+        except ValueError as e:
+            # This is typically due to missing API key
+            logger.error(f"Configuration error for Trip {trip.id}: {e}")
+        except Exception as e:
+            logger.error(
+                f"Error during route calculation or ELD log generation for Trip {trip.id}: {e}"
+            )
+        return self.set_status(trip, "error_processing")
+
+    def set_status(self, trip: Trip, new_status: str) -> Trip:
+        """
+        Saves a status transition and publishes it after the transaction commits.
+        """
+        old_status = trip.status
+        with transaction.atomic():
+            trip.status = new_status
+            trip.save(update_fields=["status", "updated_at"])
+            StatsService().record_status_change(trip, old_status, new_status)
+        transaction.on_commit(lambda: publish_trip_event(trip.id, "status", status=new_status))
+        return trip
+
+
+class MapService:
+    """
+    Service behind the fleet map: indexes trips for bbox queries and serves map
+    tiles as cached GeoJSON features.
+
+    Tiles are geographic: zoom ``z`` splits the world into 2^z x 2^z lon/lat cells.
+    Each tile holds the grid-clustered pickup and dropoff points inside it and the
+    routes crossing it, simplified for the zoom level, and is cached independently
+    so panning reuses tiles already built.
+
+    Tiles are versioned per region (their ancestor tile at ``REGION_ZOOM``), so a
+    trip change only retires the tiles of the regions its points and route cover.
+    Bulk changes bump a global version instead. The versions live in the cache,
+    so workers only see each other's invalidations through a shared cache (Redis).
+    """
+
+    SHAPE_ZOOMS = (4, 7, 10, 13)  # Zoom levels with precomputed route simplifications
+    CLUSTER_GRID = 8  # Cluster cells per tile side
+    REGION_ZOOM = 5  # Tiles below one tile of this zoom share a cache version
+    VERSION_KEY = "trip-map:version"
+
+    @staticmethod
+    def tolerance(zoom: int) -> float:
+        # About one pixel of a 256 px tile, in degrees
+        return 360 / (256 * 2**zoom)
+
+    def shape_zoom(self, zoom: int) -> int:
+        """
+        Returns the precomputed simplification level used to draw routes at ``zoom``.
+        """
+        levels = [level for level in self.SHAPE_ZOOMS if level <= zoom]
+        return levels[-1] if levels else self.SHAPE_ZOOMS[0]
+
+    def index_trip(self, trip: Trip) -> None:
+        """
+        (Re)builds the map points and per-zoom route shapes of a trip.
+        """
+        # Tiles showing the trip where it was and where it is now are both stale
+        self.invalidate_trip(trip)
+        TripMapPoint.objects.filter(trip=trip).delete()
+        TripRouteShape.objects.filter(trip=trip).delete()
+
+        points = []
+        for kind, location in (
+            ("pickup", trip.pickup_location),
+            ("dropoff", trip.dropoff_location),
+        ):
+            try:
+                points.append(
+                    TripMapPoint(
+                        trip=trip,
+                        kind=kind,
+                        longitude=float(location["longitude"]),
+                        latitude=float(location["latitude"]),
+                    )
+                )
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Trip {trip.id} has no valid {kind} location for the map.")
+        TripMapPoint.objects.bulk_create(points)
+
+        if trip.route_geometry:
+            try:
+                coordinates = parse_line_coordinates(trip.route_geometry)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Could not read the route geometry of Trip {trip.id}: {e}")
+            else:
+                low, high = coordinates.min(axis=0), coordinates.max(axis=0)
+                TripRouteShape.objects.bulk_create(
+                    TripRouteShape(
+                        trip=trip,
+                        zoom=zoom,
+                        coordinates=np.round(
+                            simplify(coordinates, self.tolerance(zoom)), 6
+                        ).tolist(),
+                        min_longitude=low[0],
+                        min_latitude=low[1],
+                        max_longitude=high[0],
+                        max_latitude=high[1],
+                    )
+                    for zoom in self.SHAPE_ZOOMS
+                )
+
+        self.invalidate_trip(trip)
+
+    def invalidate(self) -> None:
+        """
+        Retires every cached tile by moving to a new global cache version.
+        """
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, 1, None)
+
+    def invalidate_trip(self, trip: Trip) -> None:
+        """
+        Retires, once the transaction commits, the cached tiles covering the trip's
+        indexed points and route. Call it before the trip's map rows change.
+        """
+        corners = list(TripMapPoint.objects.filter(trip=trip).values_list("longitude", "latitude"))
+        shapes = TripRouteShape.objects.filter(trip=trip, zoom=self.SHAPE_ZOOMS[0]).values_list(
+            "min_longitude", "min_latitude", "max_longitude", "max_latitude"
+        )
+        for min_lon, min_lat, max_lon, max_lat in shapes:
+            corners += [(min_lon, min_lat), (max_lon, max_lat)]
+        if not corners:
+            return
+        low, high = np.min(corners, axis=0), np.max(corners, axis=0)
+        bbox = (*low.tolist(), *high.tolist())
+        transaction.on_commit(lambda: self.invalidate_bbox(bbox))
+
+    def invalidate_bbox(self, bbox) -> None:
+        """
+        Retires the cached tiles, at every zoom, of the regions overlapping ``bbox``.
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        # Routes match tiles with inclusive bounds, so also cover tiles touching an edge
+        bbox = (min_lon - 1e-9, min_lat - 1e-9, max_lon + 1e-9, max_lat + 1e-9)
+        version = uuid.uuid4().hex
+        keys = {}
+        for zoom in range(self.REGION_ZOOM + 1):
+            columns, rows = self.tile_ranges(bbox, zoom)
+            keys.update({self.region_key(zoom, x, y): version for x in columns for y in rows})
+        cache.set_many(keys, None)
+
+    def region_key(self, zoom: int, x: int, y: int) -> str:
+        """
+        Returns the version key of the region holding tile ``(zoom, x, y)``: its
+        ancestor at ``REGION_ZOOM``, or the tile itself at lower zooms.
+        """
+        shift = max(zoom - self.REGION_ZOOM, 0)
+        return f"trip-map:version:{zoom - shift}:{x >> shift}:{y >> shift}"
+
+    def tile_ranges(self, bbox, zoom: int) -> tuple[range, range]:
+        """
+        Returns the tile columns and rows at ``zoom`` covering ``bbox`` (min lon,
+        min lat, max lon, max lat).
+        """
+        count = 2**zoom
+        min_lon, min_lat, max_lon, max_lat = bbox
+
+        def column(lon):
+            return min(max(int((lon + 180) / 360 * count), 0), count - 1)
+
+        def row(lat):
+            return min(max(int((lat + 90) / 180 * count), 0), count - 1)
+
+        return range(column(min_lon), column(max_lon) + 1), range(row(min_lat), row(max_lat) + 1)
+
+    def feature_collection(self, bbox, zoom: int) -> dict:
+        """
+        Returns the GeoJSON FeatureCollection of the tiles covering ``bbox``.
+
+        Raises:
+            ValueError: If the bbox spans more than ``MAP_MAX_TILES`` tiles at ``zoom``.
+        """
+        columns, rows = self.tile_ranges(bbox, zoom)
+        if len(columns) * len(rows) > settings.MAP_MAX_TILES:
+            raise ValueError(
+                f"The bbox covers {len(columns) * len(rows)} tiles at zoom {zoom}; "
+                f"at most {settings.MAP_MAX_TILES} are allowed. Zoom in or shrink the bbox."
+            )
+
+        regions = {(x, y): self.region_key(zoom, x, y) for x in columns for y in rows}
+        versions = cache.get_many([self.VERSION_KEY, *set(regions.values())])
+        version = versions.get(self.VERSION_KEY, 0)
+        keys = {
+            f"trip-map:v{version}.{versions.get(region, 0)}:{zoom}:{x}:{y}": (x, y)
+            for (x, y), region in regions.items()
+        }
+        cached = cache.get_many(list(keys))
+        missing = {key: self.build_tile(zoom, *keys[key]) for key in keys if key not in cached}
+        if missing:
+            cache.set_many(missing, settings.MAP_TILE_CACHE_TTL)
+
+        points: list[dict] = []
+        routes: dict[int, dict] = {}
+        for key in keys:
+            tile = cached.get(key) or missing[key]
+            points.extend(tile["points"])
+            # A route crossing several tiles is only drawn once
+            for route in tile["routes"]:
+                routes.setdefault(route["properties"]["trip"], route)
+        return {"type": "FeatureCollection", "features": points + list(routes.values())}
+
+    def build_tile(self, zoom: int, x: int, y: int) -> dict:
+        count = 2**zoom
+        width, height = 360 / count, 180 / count
+        min_lon, min_lat = -180 + x * width, -90 + y * height
+        max_lon, max_lat = min_lon + width, min_lat + height
+
+        # Half-open bounds so each point belongs to exactly one tile; the last
+        # column and row also take the points on the antimeridian and the pole
+        points = TripMapPoint.objects.filter(
+            longitude__gte=min_lon,
+            latitude__gte=min_lat,
+            **{"longitude__lt" if x < count - 1 else "longitude__lte": max_lon},
+            **{"latitude__lt" if y < count - 1 else "latitude__lte": max_lat},
+        )
+
+        point_features = []
+        for kind, _ in TripMapPoint.KIND_CHOICES:
+            rows = list(points.filter(kind=kind).values_list("trip_id", "longitude", "latitude"))
+            if rows:
+                point_features.extend(
+                    self.cluster(
+                        kind,
+                        rows,
+                        min_lon,
+                        min_lat,
+                        width / self.CLUSTER_GRID,
+                        height / self.CLUSTER_GRID,
+                    )
+                )
+
+        shapes = TripRouteShape.objects.filter(
+            zoom=self.shape_zoom(zoom),
+            min_longitude__lte=max_lon,
+            max_longitude__gte=min_lon,
+            min_latitude__lte=max_lat,
+            max_latitude__gte=min_lat,
+        ).values_list("trip_id", "trip__status", "coordinates")
+        route_features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": coordinates},
+                "properties": {"trip": trip_id, "status": trip_status},
+            }
+            for trip_id, trip_status, coordinates in shapes
+        ]
+        return {"points": point_features, "routes": route_features}
+
+    def cluster(self, kind, rows, min_lon, min_lat, cell_width, cell_height) -> list[dict]:
+        """
+        Groups points into grid cells and returns one Point feature per non-empty
+        cell, placed at the mean of its points.
+        """
+        trip_ids = np.array([row[0] for row in rows])
+        coordinates = np.array([row[1:] for row in rows], dtype=float)
+        cells = np.floor((coordinates - [min_lon, min_lat]) / [cell_width, cell_height])
+        cells = np.clip(cells, 0, self.CLUSTER_GRID - 1).astype(int)
+        _, cell_index = np.unique(
+            cells[:, 0] * self.CLUSTER_GRID + cells[:, 1], return_inverse=True
+        )
+        counts = np.bincount(cell_index)
+        centers = np.column_stack(
+            [np.bincount(cell_index, weights=coordinates[:, axis]) / counts for axis in (0, 1)]
+        )
+
+        features = []
+        for index, (count, center) in enumerate(
+            zip(counts.tolist(), centers.tolist(), strict=True)
+        ):
+            properties = {"kind": kind, "count": count}
+            if count == 1:
+                properties["trip"] = int(trip_ids[cell_index == index][0])
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [round(v, 6) for v in center]},
+                    "properties": properties,
+                }
+            )
+        return features
+
+
+class IdempotencyService:
+    """
+    Service to make non-idempotent requests safe to retry.
+
+    The first request carrying a given key claims it by inserting an in-progress
+    row; the unique constraint on ``key`` guarantees only one request wins. Any
+    concurrent duplicate waits for the winner to store its response, and later
+    duplicates are answered from the stored row until it expires.
+
+    The claim is a lease (``IDEMPOTENCY_LEASE``, derived from the ORS timeouts)
+    so that a request whose worker died does not lock its key; storing the response extends the row to
+    ``IDEMPOTENCY_KEY_TTL``. Each claim also purges a batch of expired rows.
+    """
+
+    PURGE_BATCH_SIZE = 100
+
+    def __init__(self):
+        self.ttl = timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        self.lease = timedelta(seconds=settings.IDEMPOTENCY_LEASE)
+        self.wait_timeout = settings.IDEMPOTENCY_WAIT_TIMEOUT
+        self.poll_interval = settings.IDEMPOTENCY_POLL_INTERVAL
+
+    @staticmethod
+    def fingerprint(data) -> str:
+        """
+        Returns a stable hash of the request payload, used to reject a key that is
+        reused for a different request.
+        """
+        payload = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def acquire(self, key: str, request_hash: str) -> tuple[IdempotencyKey, bool]:
+        """
+        Claims ``key`` for the current request.
+
+        Returns:
+            A ``(record, created)`` tuple. ``created`` is True when the caller owns
+            the key and must process the request, False when it is a duplicate.
+        """
+        now = timezone.now()
+        expired = IdempotencyKey.objects.filter(expires_at__lte=now)
+        # Ids first: MySQL does not support LIMIT in an IN subquery
+        purge_ids = list(expired.values_list("pk", flat=True)[: self.PURGE_BATCH_SIZE])
+        expired.filter(Q(pk__in=purge_ids) | Q(key=key)).delete()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key=key, request_hash=request_hash, expires_at=now + self.lease
+                )
+            return record, True
+        except IntegrityError:
+            try:
+                return IdempotencyKey.objects.get(key=key), False
+            except IdempotencyKey.DoesNotExist:
+                # The owner released the key in between; claim it again
+                return self.acquire(key, request_hash)
+
+    def wait_for_result(self, record: IdempotencyKey) -> IdempotencyKey | None:
+        """
+        Polls until the request that owns ``record`` has stored its response.
+
+        Returns:
+            The completed record, or None if it did not complete within the wait
+            timeout or was released because the original request failed.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while not record.is_complete:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+            try:
+                record.refresh_from_db()
+            except IdempotencyKey.DoesNotExist:
+                return None
+        return record
+
+    def store(self, record: IdempotencyKey, status_code: int, body) -> None:
+        """
+        Saves the response of the owning request so duplicates can replay it.
+
+        If the lease ran out and a retry claimed the key in the meantime, the claim
+        is lost: the response is logged and dropped instead of failing a request
+        whose trip is already committed.
+        """
+        record.status_code = status_code
+        record.response_body = json.loads(json.dumps(body, default=str))
+        record.expires_at = timezone.now() + self.ttl
+        updated = IdempotencyKey.objects.filter(
+            pk=record.pk, request_hash=record.request_hash
+        ).update(
+            status_code=record.status_code,
+            response_body=record.response_body,
+            expires_at=record.expires_at,
+        )
+        if not updated:
+            logger.warning(
+                f"Idempotency-Key {record.key} expired before its response was stored; "
+                "increase IDEMPOTENCY_LEASE"
+            )
+
+    def release(self, record: IdempotencyKey) -> None:
+        """
+        Drops the claim on a key whose request failed, so a retry can process it.
+        """
+        record.delete()
+
+
+class ArchiveService:
+    """
+    Service to move old trips and their ELD logs to compressed cold storage and back.
+
+    Archives are gzip NDJSON files with one line per trip: the trip and its logs
+    in Django's serialization format, so they can be restored with their original
+    primary keys. Each archive is recorded as a ``TripArchive`` row.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.ELD_ARCHIVE_DIR)
+
+    def archive(self, older_than, batch_size: int = 500) -> TripArchive | None:
+        """
+        Writes every trip created before ``older_than`` to a new archive file, then
+        deletes the archived trips (and, by cascade, their logs).
+
+        Returns:
+            The ``TripArchive`` record, or None if there was nothing to archive.
+        """
+        trips = Trip.objects.filter(created_at__lt=older_than).order_by("created_at", "id")
+        if not trips.exists():
+            return None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = (
+            self.directory
+            / f"trips-before-{older_than:%Y%m%d}-{timezone.now():%Y%m%dT%H%M%S}.ndjson.gz"
+        )
+        partial_path = path.with_name(path.name + ".partial")
+
+        trip_ids, log_count = [], 0
+        oldest: datetime | None = None
+        newest: datetime | None = None
+        with gzip.open(partial_path, "wt", encoding="utf-8") as archive_file:
+            trips = trips.select_related("route_steps").prefetch_related("logs")
+            for trip in trips.iterator(chunk_size=batch_size):
+                logs = list(trip.logs.all())
+                steps = getattr(trip, "route_steps", None)
+                record = {
+                    "trip": serializers.serialize("python", [trip])[0],
+                    "logs": serializers.serialize("python", logs),
+                    "route_steps": serializers.serialize("python", [steps] if steps else []),
+                }
+                # str() keeps microseconds, which DjangoJSONEncoder would truncate
+                archive_file.write(json.dumps(record, default=str) + "\n")
+                trip_ids.append(trip.id)
+                log_count += len(logs)
+                oldest = oldest or trip.created_at
+                newest = trip.created_at
+        if oldest is None or newest is None:
+            # The trips were deleted between the check and the export
+            partial_path.unlink()
+            return None
+        # Only a complete file gets its final name
+        partial_path.rename(path)
+
+        with transaction.atomic():
+            for start in range(0, len(trip_ids), batch_size):
+                batch = Trip.objects.filter(id__in=trip_ids[start : start + batch_size])
+                StatsService().record_trips_removed(batch)
+                batch.delete()
+            transaction.on_commit(MapService().invalidate)
+            archive = TripArchive.objects.create(
+                path=str(path),
+                trip_count=len(trip_ids),
+                log_count=log_count,
+                oldest_trip_at=oldest,
+                newest_trip_at=newest,
+            )
+        logger.info(f"Archived {len(trip_ids)} trips and {log_count} ELD logs to {path}")
+        return archive
+
+    def rehydrate(self, path) -> tuple[int, int]:
+        """
+        Restores the trips and logs of an archive file with their original ids.
+        Trips that are already online are skipped.
+
+        Returns:
+            A ``(trips, logs)`` tuple with the number of restored rows.
+        """
+        trip_count = log_count = 0
+        with gzip.open(path, "rt", encoding="utf-8") as archive_file, transaction.atomic():
+            for line in archive_file:
+                record = json.loads(line)
+                trip = cast(
+                    "Trip", next(serializers.deserialize("python", [record["trip"]])).object
+                )
+                if Trip.objects.filter(pk=trip.pk).exists():
+                    continue
+                if trip.driver_id and not Driver.objects.filter(pk=trip.driver_id).exists():
+                    trip.driver_id = None
+                trip.save(force_insert=True)
+                # auto_now_add/auto_now overwrite the timestamps on insert; restore them
+                Trip.objects.filter(pk=trip.pk).update(
+                    created_at=record["trip"]["fields"]["created_at"],
+                    updated_at=record["trip"]["fields"]["updated_at"],
+                )
+                trip.refresh_from_db()
+                logs = [
+                    cast("ELDLog", item.object)
+                    for item in serializers.deserialize("python", record["logs"])
+                ]
+                ELDLog.objects.bulk_create(logs)
+                for item in serializers.deserialize("python", record.get("route_steps", [])):
+                    item.save()
+                StatsService().record_trip_created(trip)
+                StatsService().record_logs(logs)
+                MapService().index_trip(trip)
+                trip_count += 1
+                log_count += len(logs)
+
+            TripArchive.objects.filter(path=str(path)).update(rehydrated_at=timezone.now())
+        logger.info(f"Rehydrated {trip_count} trips and {log_count} ELD logs from {path}")
+        return trip_count, log_count
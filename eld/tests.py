@@ -1,9 +1,62 @@
-from unittest.mock import patch
+import asyncio
+import os
+import tempfile
+import threading
+from datetime import UTC, date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import call, patch
 
-from django.core.management import call_command
-from django.test import TestCase
+import numpy as np
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.http import StreamingHttpResponse
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-from eld.models import ELDLog, Trip
+from eld import hos
+from eld.events import EventBroker, RedisEventBroker
+from eld.geometry import RouteProfile, parse_line_coordinates, simplify
+from eld.management.commands.loadtest import summarize
+from eld.models import (
+    Driver,
+    DriverDutyDay,
+    ELDLog,
+    IdempotencyKey,
+    StatsCounter,
+    Trip,
+    TripArchive,
+    TripRouteSteps,
+)
+from eld.ors_stub import ORSStubServer
+from eld.services import (
+    DutyLedgerService,
+    IdempotencyService,
+    RouteService,
+    StatsService,
+    TripProcessingService,
+)
+
+MOCK_ROUTE_INFO = {
+    "distance_meters": 1270000,
+    "duration_seconds": 45000,
+    "geometry": {
+        "type": "LineString",
+        "coordinates": [[-74.006, 40.7128], [-87.6298, 41.8781]],
+    },
+    "waypoints": [],
+}
+
+TRIP_PAYLOAD = {
+    "current_location": {"latitude": 40.7128, "longitude": -74.0060},
+    "pickup_location": {"latitude": 40.7128, "longitude": -74.0060},
+    "dropoff_location": {"latitude": 41.8781, "longitude": -87.6298},
+    "current_cycle_used": "10.00",
+}
 
 
 class SeedDbCommandTest(TestCase):
@@ -73,3 +126,901 @@ class SeedDbCommandTest(TestCase):
 
         # Ensure no ELD logs were created in this case
         self.assertEqual(ELDLog.objects.count(), 0)
+
+
+class TripIdempotencyTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("trip-list-create")
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_duplicate_request_replays_stored_response(self, mock_calculate_route):
+        """
+        Test that a retried request with the same key creates a single trip and
+        routes only once.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+
+        first = self.client.post(self.url, TRIP_PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        second = self.client.post(self.url, TRIP_PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Trip.objects.count(), 1)
+        self.assertEqual(ELDLog.objects.count(), 4)
+        mock_calculate_route.assert_called_once()
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_key_reused_with_different_payload_is_rejected(self, mock_calculate_route):
+        """
+        Test that reusing a key for a different request body returns 422.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+
+        self.client.post(self.url, TRIP_PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        response = self.client.post(
+            self.url,
+            {**TRIP_PAYLOAD, "current_cycle_used": "20.00"},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="abc",
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Trip.objects.count(), 1)
+
+    def test_in_progress_key_times_out_with_conflict(self):
+        """
+        Test that a duplicate of a request that never completes gets 409.
+        """
+        with self.settings(IDEMPOTENCY_WAIT_TIMEOUT=0):
+            IdempotencyKey.objects.create(
+                key="abc",
+                request_hash=IdempotencyService.fingerprint(TRIP_PAYLOAD),
+                expires_at=timezone.now() + timedelta(hours=1),
+            )
+            response = self.client.post(
+                self.url, TRIP_PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="abc"
+            )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Trip.objects.count(), 0)
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_abandoned_claim_expires_after_its_lease(self, mock_calculate_route):
+        """
+        Test that a claim left by a crashed request only blocks its key for the
+        lease, and that a stored response keeps the key for the full TTL.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        IdempotencyKey.objects.create(
+            key="abc",
+            request_hash=IdempotencyService.fingerprint(TRIP_PAYLOAD),
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+
+        response = self.client.post(
+            self.url, TRIP_PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="abc"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        record = IdempotencyKey.objects.get(key="abc")
+        self.assertGreater(record.expires_at, timezone.now() + timedelta(hours=23))
+
+    def test_store_after_losing_the_claim_does_not_raise(self):
+        """
+        Test that a request whose lease ran out and whose key was re-claimed by a
+        retry drops its response instead of failing, leaving the new claim intact.
+        """
+        service = IdempotencyService()
+        request_hash = service.fingerprint(TRIP_PAYLOAD)
+        record, _ = service.acquire("abc", request_hash)
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        retry, created = service.acquire("abc", request_hash)
+        self.assertTrue(created)
+
+        with self.assertLogs("eld.services", level="WARNING"):
+            service.store(record, 201, {"id": 1})
+
+        retry.refresh_from_db()
+        self.assertFalse(retry.is_complete)
+
+    def test_claim_purges_expired_keys(self):
+        """
+        Test that claiming a key deletes expired rows of other keys.
+        """
+        expired_at = timezone.now() - timedelta(minutes=1)
+        for key in ("old-1", "old-2"):
+            IdempotencyKey.objects.create(key=key, request_hash="x", expires_at=expired_at)
+
+        record, created = IdempotencyService().acquire("new", "y")
+
+        self.assertTrue(created)
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"])
+        self.assertLess(record.expires_at, timezone.now() + timedelta(hours=1))
+
+    def test_key_released_during_claim_is_claimed_again(self):
+        """
+        Test that a key released by its owner between the failed insert and the
+        lookup is claimed by the caller instead of raising.
+        """
+        create = IdempotencyKey.objects.create
+        calls = []
+
+        def create_after_conflict(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise IntegrityError("duplicate key")
+            return create(**kwargs)
+
+        with patch.object(IdempotencyKey.objects, "create", side_effect=create_after_conflict):
+            record, created = IdempotencyService().acquire("abc", "x")
+
+        self.assertTrue(created)
+        self.assertEqual(record.key, "abc")
+        self.assertEqual(len(calls), 2)
+
+
+class TripEventsTest(TestCase):
+    def test_broker_delivers_events_published_from_another_thread(self):
+        """
+        Test that an event published by sync processing code reaches an async subscriber.
+        """
+
+        async def listen():
+            broker = EventBroker()
+            async with broker.subscribe(["trip:1"]) as subscription:
+                publisher = threading.Thread(
+                    target=broker.publish, args=("trip:1", {"event": "status"})
+                )
+                publisher.start()
+                event = await subscription.get(timeout=1)
+                publisher.join()
+            return event, broker._subscribers
+
+        event, subscribers = asyncio.run(listen())
+        self.assertEqual(event, {"event": "status"})
+        self.assertEqual(dict(subscribers), {})
+
+    def test_subscriber_with_closed_loop_is_dropped(self):
+        """
+        Test that publishing to a subscriber whose event loop has closed drops it
+        instead of raising into the publisher.
+        """
+        broker = EventBroker()
+
+        async def subscribe():
+            broker.subscribe(["trip:1"])
+
+        asyncio.run(subscribe())
+        broker.publish("trip:1", {"event": "status"})
+
+        self.assertEqual(dict(broker._subscribers), {})
+
+    def test_redis_listener_reconnects_after_connection_loss(self):
+        """
+        Test that the Redis listener logs a dropped connection and reconnects, so open
+        streams keep receiving events.
+        """
+
+        class FakePubSub:
+            def __init__(self, messages):
+                self.messages = messages
+
+            async def psubscribe(self, pattern):
+                pass
+
+            async def listen(self):
+                for message in self.messages:
+                    if isinstance(message, Exception):
+                        raise message
+                    yield message
+                await asyncio.Event().wait()
+
+            async def aclose(self):
+                pass
+
+        class FakeRedis:
+            def __init__(self, messages):
+                self.messages = messages
+
+            def pubsub(self):
+                return FakePubSub(self.messages)
+
+            async def aclose(self):
+                pass
+
+        message = {"type": "pmessage", "channel": b"eld:trip:1", "data": '{"event": "status"}'}
+        clients = [FakeRedis([ConnectionError("Connection reset")]), FakeRedis([message])]
+        broker = RedisEventBroker("redis://localhost:6379/0")
+        broker.RECONNECT_MIN_DELAY = 0
+
+        async def listen():
+            async with broker.subscribe(["trip:1"]) as subscription:
+                event = await subscription.get(timeout=1)
+            assert broker._listener is not None
+            broker._listener.cancel()
+            return event
+
+        with (
+            patch("redis.asyncio.Redis.from_url", side_effect=clients),
+            self.assertLogs("eld.events", level="ERROR") as logs,
+        ):
+            event = asyncio.run(listen())
+
+        self.assertEqual(event, {"event": "status"})
+        self.assertIn("Connection reset", logs.output[0])
+
+    @patch("eld.services.publish_trip_event")
+    @patch("eld.services.RouteService.calculate_route")
+    def test_processing_publishes_logs_ready_and_status(self, mock_calculate_route, mock_publish):
+        """
+        Test that processing a trip publishes its events once the transaction commits.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        trip = Trip.objects.create(**TRIP_PAYLOAD)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TripProcessingService().process(trip)
+
+        self.assertEqual(
+            mock_publish.call_args_list,
+            [call(trip.id, "logs_ready", count=4), call(trip.id, "status", status="processed")],
+        )
+
+
+class TripEventStreamTest(TransactionTestCase):
+    # The async view reads the trip from another thread, so the row must be committed
+    def test_stream_of_finished_trip_sends_status_and_closes(self):
+        """
+        Test that streaming a trip that is no longer pending returns its status and ends.
+        """
+        trip = Trip.objects.create(**TRIP_PAYLOAD, status="processed")
+
+        async def read_stream():
+            response = await self.async_client.get(
+                reverse("trip-event-stream", kwargs={"pk": trip.pk})
+            )
+            assert isinstance(response, StreamingHttpResponse)
+            return response, [chunk async for chunk in response.streaming_content]
+
+        response, chunks = asyncio.run(read_stream())
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(len(chunks), 1)
+        self.assertIn(b"event: status", chunks[0])
+        self.assertIn(b'"status": "processed"', chunks[0])
+
+    def test_pending_trip_stream_receives_pushed_status(self):
+        """
+        Test that a stream opened on a pending trip receives the transition
+        published when the trip is processed, then closes.
+        """
+        trip = Trip.objects.create(**TRIP_PAYLOAD)
+
+        async def follow_stream():
+            response = await self.async_client.get(
+                reverse("trip-event-stream", kwargs={"pk": trip.pk})
+            )
+            assert isinstance(response, StreamingHttpResponse)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            await asyncio.to_thread(TripProcessingService().set_status, trip, "processed")
+            return first, [chunk async for chunk in chunks]
+
+        first, rest = asyncio.run(follow_stream())
+        self.assertIn(b'"status": "pending"', first)
+        self.assertEqual(len(rest), 1)
+        self.assertIn(b'"status": "processed"', rest[0])
+
+    def test_stream_is_refused_under_wsgi(self):
+        """
+        Test that the event stream answers 501 instead of pinning a WSGI worker.
+        """
+        trip = Trip.objects.create(**TRIP_PAYLOAD)
+
+        response = self.client.get(reverse("trip-event-stream", kwargs={"pk": trip.pk}))
+
+        self.assertEqual(response.status_code, 501)
+
+
+class StopPlacementTest(TestCase):
+    def test_profile_locates_points_by_distance_and_time(self):
+        """
+        Test that points are interpolated along the route by distance and by driving time.
+        """
+        coordinates = np.column_stack((np.linspace(0, 10, 50001), np.zeros(50001)))
+        profile = RouteProfile(coordinates, duration_seconds=10 * hos.HOUR)
+
+        midpoint = profile.locate_distance(profile.total_distance / 2)
+        self.assertAlmostEqual(midpoint[0][0], 5, places=6)
+        located = profile.locate_time([0, 2.5 * hos.HOUR, 10 * hos.HOUR])
+        np.testing.assert_allclose(located[:, 0], [0, 2.5, 10], atol=1e-6)
+
+    def test_plan_places_breaks_rests_and_fuel_stops(self):
+        """
+        Test the HOS stops of a 25-hour drive with one fuel stop.
+        """
+        plan = hos.plan_trip(25 * hos.HOUR, cycle_used_hours=0, fuel_at=[20 * hos.HOUR])
+
+        self.assertEqual(
+            [(stop["type"], stop["driving_seconds"] / hos.HOUR) for stop in plan["stops"]],
+            [("break", 8), ("rest", 11), ("break", 19), ("fuel", 20), ("rest", 22)],
+        )
+        self.assertEqual(plan["on_duty_seconds"], 27.5 * hos.HOUR)
+
+    def test_plan_restarts_when_cycle_is_exhausted(self):
+        """
+        Test that a 34-hour restart is scheduled once the 70-hour cycle runs out.
+        """
+        plan = hos.plan_trip(5 * hos.HOUR, cycle_used_hours=67)
+
+        self.assertEqual(plan["stops"][0]["type"], "restart")
+        self.assertEqual(plan["stops"][0]["driving_seconds"], 2 * hos.HOUR)
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_processing_stores_stops_on_trip(self, mock_calculate_route):
+        """
+        Test that a processed trip's stops are located on its route.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        trip = Trip.objects.create(**TRIP_PAYLOAD)
+
+        TripProcessingService().process(trip)
+
+        trip.refresh_from_db()
+        stops = trip.route_stops or []
+        self.assertEqual([stop["type"] for stop in stops], ["break", "rest"])
+        for stop in stops:
+            self.assertTrue(-87.6298 <= stop["location"][0] <= -74.006)
+
+
+class TripSimulationTest(TestCase):
+    def test_batch_matches_single_trip_plans(self):
+        """
+        Test that the batched evaluation agrees with plan_trip for every cycle value.
+        """
+        cycles = [0, 10.5, 45, 62, 69.75, 70]
+        fuel_at = [9 * hos.HOUR, 27 * hos.HOUR]
+        batch = hos.evaluate_batch(40 * hos.HOUR, cycles, fuel_at=fuel_at)
+
+        for index, cycle in enumerate(cycles):
+            plan = hos.plan_trip(40 * hos.HOUR, cycle_used_hours=cycle, fuel_at=fuel_at)
+            types = [stop["type"] for stop in plan["stops"]]
+            self.assertEqual(batch["total_seconds"][index], plan["total_seconds"])
+            self.assertEqual(batch["on_duty_seconds"][index], plan["on_duty_seconds"])
+            self.assertEqual(batch["rests"][index], types.count("rest"))
+            self.assertEqual(batch["breaks"][index], types.count("break"))
+            self.assertEqual(batch["restarts"][index], types.count("restart"))
+            self.assertEqual(batch["fuel_stops"][index], types.count("fuel"))
+
+    @patch("eld.services.RouteService._request_route")
+    def test_simulate_evaluates_grid_without_writing_rows(self, mock_request_route):
+        """
+        Test that a departure x cycle grid is answered from a single cached route.
+        """
+        mock_request_route.return_value = MOCK_ROUTE_INFO
+        cache.clear()
+        payload = {
+            "pickup_location": TRIP_PAYLOAD["pickup_location"],
+            "dropoff_location": TRIP_PAYLOAD["dropoff_location"],
+            "departure_times": ["2026-01-05T08:00:00Z", "2026-01-05T12:00:00Z"],
+            "current_cycle_used": ["0.00", "65.00", "0.00"],
+        }
+
+        url = reverse("trip-simulate")
+        response = APIClient().post(url, payload, format="json")
+        APIClient().post(url, payload, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        scenarios = response.json()["scenarios"]
+        self.assertEqual(len(scenarios), 6)
+        self.assertEqual(scenarios[0]["eta"], "2026-01-06T09:00:00Z")
+        self.assertEqual(scenarios[0]["rest_count"], 1)
+        self.assertEqual(scenarios[1]["restart_count"], 1)
+        self.assertEqual(scenarios[3]["eta"], "2026-01-06T13:00:00Z")
+        mock_request_route.assert_called_once()
+        self.assertEqual(Trip.objects.count(), 0)
+        self.assertEqual(ELDLog.objects.count(), 0)
+
+
+class DutyLedgerTest(TestCase):
+    def setUp(self):
+        self.driver = Driver.objects.create(name="Jordan")
+        self.trip = Trip.objects.create(**TRIP_PAYLOAD, driver=self.driver)
+
+    def log(self, status, start, hours):
+        return ELDLog(
+            trip=self.trip, status=status, start_time=start, end_time=start + timedelta(hours=hours)
+        )
+
+    def test_logs_are_split_across_days_and_summed_over_eight_days(self):
+        """
+        Test that on-duty time is credited to each day it falls on and that the cycle
+        only counts the last eight days.
+        """
+        start = datetime(2026, 3, 1, 20, tzinfo=UTC)
+        DutyLedgerService().record_logs(
+            self.driver.id,
+            [
+                self.log("driving", start, 6),
+                self.log("off_duty", start + timedelta(hours=6), 10),
+                self.log("on_duty", start + timedelta(days=8), 2),
+            ],
+        )
+
+        days = dict(self.driver.duty_days.values_list("day", "on_duty_seconds"))
+        self.assertEqual(days[date(2026, 3, 1)], 4 * hos.HOUR)
+        self.assertEqual(days[date(2026, 3, 2)], 2 * hos.HOUR)
+        service = DutyLedgerService()
+        self.assertEqual(service.cycle_used_hours(self.driver.id, as_of=start), Decimal("4.00"))
+        self.assertEqual(
+            service.cycle_used_hours(self.driver.id, as_of=start + timedelta(days=8)),
+            Decimal("4.00"),
+        )
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_trip_without_cycle_uses_driver_ledger(self, mock_calculate_route):
+        """
+        Test that a trip created without current_cycle_used is planned from the
+        driver's ledger and that its logs are added to the ledger.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        DriverDutyDay.objects.create(
+            driver=self.driver, day=timezone.localdate(), on_duty_seconds=30 * hos.HOUR
+        )
+        payload = {**TRIP_PAYLOAD, "driver": self.driver.id}
+        del payload["current_cycle_used"]
+
+        response = APIClient().post(reverse("trip-list-create"), payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["current_cycle_used"], "30.00")
+        # 1h pickup + 12.5h driving + 1h dropoff, which may run past midnight
+        self.assertEqual(
+            DutyLedgerService().cycle_used_hours(
+                self.driver.id, as_of=timezone.now() + timedelta(days=1)
+            ),
+            Decimal("44.50"),
+        )
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_ledger_over_the_cycle_is_capped(self, mock_calculate_route):
+        """
+        Test that a ledger holding more than 100 hours yields a full cycle instead of
+        overflowing current_cycle_used, and that trips and simulations still work.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        DriverDutyDay.objects.create(
+            driver=self.driver, day=timezone.localdate(), on_duty_seconds=120 * hos.HOUR
+        )
+        payload = {**TRIP_PAYLOAD, "driver": self.driver.id}
+        del payload["current_cycle_used"]
+
+        response = APIClient().post(reverse("trip-list-create"), payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["current_cycle_used"], "70.00")
+        self.assertEqual(APIClient().get(reverse("trip-list-create")).status_code, 200)
+        simulation = APIClient().post(
+            reverse("trip-simulate"),
+            {
+                "pickup_location": TRIP_PAYLOAD["pickup_location"],
+                "dropoff_location": TRIP_PAYLOAD["dropoff_location"],
+                "departure_times": [timezone.now().isoformat()],
+                "driver": self.driver.id,
+            },
+            format="json",
+        )
+        self.assertEqual(simulation.status_code, 200)
+        self.assertEqual(simulation.json()["scenarios"][0]["restart_count"], 1)
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_simulation_uses_cycle_as_of_each_departure(self, mock_calculate_route):
+        """
+        Test that hours rolling out of the 8-day window no longer count for a later
+        departure of the same simulation.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        today = timezone.localdate()
+        DriverDutyDay.objects.create(
+            driver=self.driver, day=today - timedelta(days=7), on_duty_seconds=60 * hos.HOUR
+        )
+        now = timezone.now()
+
+        response = APIClient().post(
+            reverse("trip-simulate"),
+            {
+                "pickup_location": TRIP_PAYLOAD["pickup_location"],
+                "dropoff_location": TRIP_PAYLOAD["dropoff_location"],
+                "departure_times": [now.isoformat(), (now + timedelta(days=1)).isoformat()],
+                "driver": self.driver.id,
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        cycles = [scenario["current_cycle_used"] for scenario in response.json()["scenarios"]]
+        self.assertEqual(cycles, ["60.00", "0.00"])
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_deleting_a_trip_removes_its_duty_time(self, mock_calculate_route):
+        """
+        Test that a deleted trip's on-duty time no longer counts against the cycle.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        service = DutyLedgerService()
+        trip = Trip.objects.create(**TRIP_PAYLOAD, driver=self.driver)
+        TripProcessingService().process(trip)
+        later = timezone.now() + timedelta(days=1)
+        self.assertGreater(service.cycle_used_hours(self.driver.id, as_of=later), 0)
+
+        response = APIClient().delete(
+            reverse("trip-retrieve-update-destroy", kwargs={"pk": trip.pk})
+        )
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(service.cycle_used_hours(self.driver.id, as_of=later), Decimal("0.00"))
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_reassigning_a_trip_moves_its_duty_time(self, mock_calculate_route):
+        """
+        Test that changing a trip's driver moves its on-duty time to the new driver,
+        so deleting the trip afterwards leaves neither ledger with stale hours.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        service = DutyLedgerService()
+        other = Driver.objects.create(name="Alex")
+        trip = Trip.objects.create(**TRIP_PAYLOAD, driver=self.driver)
+        TripProcessingService().process(trip)
+        later = timezone.now() + timedelta(days=1)
+        hours = service.cycle_used_hours(self.driver.id, as_of=later)
+        self.assertEqual(hours, Decimal("14.50"))
+        url = reverse("trip-retrieve-update-destroy", kwargs={"pk": trip.pk})
+
+        response = APIClient().patch(url, {"driver": other.id}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(service.cycle_used_hours(self.driver.id, as_of=later), Decimal("0.00"))
+        self.assertEqual(service.cycle_used_hours(other.id, as_of=later), hours)
+
+        self.assertEqual(APIClient().delete(url).status_code, 204)
+        self.assertEqual(service.cycle_used_hours(self.driver.id, as_of=later), Decimal("0.00"))
+        self.assertEqual(service.cycle_used_hours(other.id, as_of=later), Decimal("0.00"))
+
+    def test_driver_list_reads_cycles_in_one_query(self):
+        """
+        Test that listing drivers annotates their cycles instead of querying per driver.
+        """
+        for name in ("Alex", "Sam"):
+            driver = Driver.objects.create(name=name)
+            DriverDutyDay.objects.create(
+                driver=driver, day=timezone.localdate(), on_duty_seconds=5 * hos.HOUR
+            )
+
+        with self.assertNumQueries(1):
+            response = APIClient().get(reverse("driver-list-create"))
+
+        cycles = {driver["name"]: driver["cycle_used_hours"] for driver in response.json()}
+        self.assertEqual(cycles, {"Alex": 5.0, "Jordan": 0.0, "Sam": 5.0})
+
+
+class ArchiveTripsCommandTest(TestCase):
+    @patch("eld.services.RouteService.calculate_route")
+    def test_archive_and_rehydrate_round_trip(self, mock_calculate_route):
+        """
+        Test that trips past the retention horizon are moved to an archive file and
+        can be restored with their ids, timestamps and logs.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        old_trip = Trip.objects.create(**TRIP_PAYLOAD)
+        TripProcessingService().process(old_trip)
+        recent_trip = Trip.objects.create(**TRIP_PAYLOAD)
+        old_created_at = timezone.now() - timedelta(days=200)
+        Trip.objects.filter(pk=old_trip.pk).update(created_at=old_created_at)
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command("archive_trips", older_than_days=183, output_dir=directory)
+
+            archive = TripArchive.objects.get()
+            self.assertEqual((archive.trip_count, archive.log_count), (1, 4))
+            self.assertTrue(Path(archive.path).exists())
+            self.assertEqual(list(Trip.objects.values_list("pk", flat=True)), [recent_trip.pk])
+            self.assertEqual(ELDLog.objects.count(), 0)
+
+            call_command("archive_trips", rehydrate=archive.path)
+
+        restored = Trip.objects.get(pk=old_trip.pk)
+        self.assertEqual(restored.created_at, old_created_at)
+        self.assertEqual(restored.status, "processed")
+        self.assertEqual(restored.logs.count(), 4)
+        archive.refresh_from_db()
+        self.assertIsNotNone(archive.rehydrated_at)
+
+    def test_partitioning_requires_postgresql(self):
+        """
+        Test that native partitioning refuses to run on other databases.
+        """
+        with self.assertRaises(CommandError):
+            call_command("partition_eldlogs")
+
+
+class TripMapTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_simplify_keeps_shape_within_tolerance(self):
+        """
+        Test that collinear vertices are dropped and corners are kept.
+        """
+        line = [[0, 0], [1, 0.0001], [2, 0], [2, 1], [2, 2]]
+
+        np.testing.assert_array_equal(simplify(line, 0.01), [[0, 0], [2, 0], [2, 2]])
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_map_clusters_points_and_caches_tiles(self, mock_calculate_route):
+        """
+        Test that nearby pickups are clustered, routes are drawn once and a repeated
+        request is served from the tile cache.
+        """
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                TripProcessingService().process(Trip.objects.create(**TRIP_PAYLOAD))
+        url = reverse("trip-map")
+        params = {"bbox": "-90,38,-70,44", "zoom": "5"}
+
+        response = APIClient().get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        features = response.json()["features"]
+        pickups = [f for f in features if f["properties"].get("kind") == "pickup"]
+        routes = [f for f in features if f["geometry"]["type"] == "LineString"]
+        self.assertEqual([f["properties"]["count"] for f in pickups], [3])
+        self.assertEqual(len(routes), 3)
+        with self.assertNumQueries(0):
+            cached = APIClient().get(url, params)
+        self.assertEqual(cached.json(), response.json())
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_trip_change_only_retires_tiles_of_its_regions(self, mock_calculate_route):
+        """
+        Test that indexing a trip elsewhere keeps cached tiles, while a trip inside
+        the requested bbox refreshes them.
+        """
+        url = reverse("trip-map")
+        params = {"bbox": "-90,38,-70,44", "zoom": "5"}
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        with self.captureOnCommitCallbacks(execute=True):
+            TripProcessingService().process(Trip.objects.create(**TRIP_PAYLOAD))
+        APIClient().get(url, params)
+
+        west_coast = [[-118.2437, 34.0522], [-115.1398, 36.1699]]
+        mock_calculate_route.return_value = {
+            **MOCK_ROUTE_INFO,
+            "geometry": {"type": "LineString", "coordinates": west_coast},
+        }
+        location = {"latitude": 34.0522, "longitude": -118.2437}
+        with self.captureOnCommitCallbacks(execute=True):
+            TripProcessingService().process(
+                Trip.objects.create(
+                    **{
+                        **TRIP_PAYLOAD,
+                        "current_location": location,
+                        "pickup_location": location,
+                        "dropoff_location": {"latitude": 36.1699, "longitude": -115.1398},
+                    }
+                )
+            )
+        with self.assertNumQueries(0):
+            APIClient().get(url, params)
+
+        mock_calculate_route.return_value = MOCK_ROUTE_INFO
+        with self.captureOnCommitCallbacks(execute=True):
+            TripProcessingService().process(Trip.objects.create(**TRIP_PAYLOAD))
+        features = APIClient().get(url, params).json()["features"]
+        pickups = [f for f in features if f["properties"].get("kind") == "pickup"]
+        self.assertEqual([f["properties"]["count"] for f in pickups], [2])
+
+    def test_map_rejects_too_many_tiles(self):
+        """
+        Test that a world-wide bbox at a high zoom is refused.
+        """
+        response = APIClient().get(reverse("trip-map"), {"bbox": "-180,-90,180,90", "zoom": "12"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class StatsTest(TestCase):
+    @patch("eld.services.RouteService.calculate_route")
+    def test_counters_follow_trip_writes(self, mock_calculate_route):
+        """
+        Test that creating, processing and deleting trips keeps the counters equal
+        to what a full scan of the tables would give.
+        """
+        mock_calculate_route.side_effect = [MOCK_ROUTE_INFO, None, MOCK_ROUTE_INFO]
+        client = APIClient()
+        trip_ids = [
+            client.post(reverse("trip-list-create"), TRIP_PAYLOAD, format="json").json()["id"]
+            for _ in range(3)
+        ]
+        client.delete(reverse("trip-retrieve-update-destroy", kwargs={"pk": trip_ids[2]}))
+
+        response = client.get(reverse("stats"), {"days": 1})
+
+        self.assertEqual(response.status_code, 200)
+        totals = response.json()["totals"]
+        self.assertEqual(totals["trip_count"], 2)
+        self.assertEqual(totals["trips_by_status"]["processed"], 1)
+        self.assertEqual(totals["trips_by_status"]["error_no_route"], 1)
+        self.assertEqual(totals["trips_by_status"]["pending"], 0)
+        self.assertEqual(totals["driving_hours"], 12.5)
+        self.assertEqual(StatsService().reconcile(dry_run=True), 0)
+
+    def test_reconcile_repairs_drift(self):
+        """
+        Test that reconcile_stats rebuilds counters that no longer match the tables.
+        """
+        Trip.objects.create(**TRIP_PAYLOAD)
+        StatsCounter.objects.create(key="trips.processed", bucket="total", value=42)
+
+        call_command("reconcile_stats")
+
+        counters = dict(StatsCounter.objects.filter(bucket="total").values_list("key", "value"))
+        self.assertEqual(counters, {"trips.pending": 1})
+
+    def test_reconcile_locks_counters_before_scanning(self):
+        """
+        Test that the counters are read (and locked) before the tables are scanned,
+        so writes committed during the scan are not wiped out.
+        """
+        Trip.objects.create(**TRIP_PAYLOAD)
+
+        with CaptureQueriesContext(connection) as queries:
+            StatsService().reconcile(dry_run=True)
+
+        tables = [
+            table
+            for query in queries.captured_queries
+            for table in (StatsCounter._meta.db_table, Trip._meta.db_table)
+            if f'FROM "{table}"' in query["sql"]
+        ]
+        self.assertEqual(tables[:2], [StatsCounter._meta.db_table, Trip._meta.db_table])
+
+
+class TripRouteStepsTest(TestCase):
+    STEPS = [
+        {
+            "distance": 100.0 * i,
+            "duration": 10.0 * i,
+            "type": i % 3,
+            "instruction": f"Turn {'left' if i % 2 else 'right'}",
+            "name": "I-80",
+            "way_points": [i, i + 1],
+        }
+        for i in range(120)
+    ]
+
+    @patch("eld.services.RouteService.calculate_route")
+    def test_steps_are_stored_columnar_and_paginated(self, mock_calculate_route):
+        """
+        Test that steps are kept out of the trip row, with repeated strings stored
+        once, and that a page of them is rebuilt on request.
+        """
+        mock_calculate_route.return_value = {**MOCK_ROUTE_INFO, "waypoints": self.STEPS}
+        trip = Trip.objects.create(**TRIP_PAYLOAD)
+        TripProcessingService().process(trip)
+
+        route_steps = TripRouteSteps.objects.get(trip=trip)
+        self.assertEqual(route_steps.count, 120)
+        self.assertEqual(route_steps.instructions, ["Turn right", "Turn left"])
+        self.assertEqual(route_steps.names, ["I-80"])
+
+        response = APIClient().get(
+            reverse("trip-route-steps", kwargs={"pk": trip.pk}), {"offset": 100, "limit": 30}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["count"], 120)
+        self.assertIsNone(body["next"])
+        self.assertEqual(body["results"], self.STEPS[100:])
+        self.assertNotIn(
+            "route_waypoints",
+            APIClient().get(reverse("trip-retrieve-update-destroy", kwargs={"pk": trip.pk})).json(),
+        )
+
+    def test_steps_of_unknown_trip_is_404(self):
+        """
+        Test that asking for the steps of a missing trip returns 404.
+        """
+        response = APIClient().get(reverse("trip-route-steps", kwargs={"pk": 999}))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_backfill_copies_legacy_waypoints(self):
+        """
+        Test that backfill_route_steps moves a pre-existing trip's route_waypoints
+        into its columnar steps row and clears the legacy column.
+        """
+        trip = Trip.objects.create(**TRIP_PAYLOAD, route_waypoints=self.STEPS)
+
+        call_command("backfill_route_steps")
+
+        trip.refresh_from_db()
+        self.assertIsNone(trip.route_waypoints)
+        response = APIClient().get(
+            reverse("trip-route-steps", kwargs={"pk": trip.pk}), {"limit": 500}
+        )
+        self.assertEqual(response.json()["results"], self.STEPS)
+
+
+class ORSStubTest(TestCase):
+    def start_stub(self, **options) -> ORSStubServer:
+        server = ORSStubServer(seed=1, **options)
+        server.start_in_thread()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        cache.clear()
+        return server
+
+    def test_route_and_trip_through_stub(self):
+        """
+        Test that RouteService talks to the stub over HTTP and that a trip is
+        processed end to end from the route it returns.
+        """
+        server = self.start_stub(vertices=50, steps=5)
+        with patch.dict(os.environ, {"OPENROUTESERVICE_BASE_URL": server.url}):
+            route_info = RouteService().calculate_route([[-74.006, 40.7128], [-87.6298, 41.8781]])
+            trip = Trip.objects.create(**TRIP_PAYLOAD)
+            TripProcessingService().process(trip)
+
+        self.assertEqual(server.request_count, 1)  # The trip reused the cached route
+        self.assertGreater(route_info["distance_meters"], 1_140_000)
+        self.assertEqual(len(route_info["waypoints"]), 6)
+        coordinates = parse_line_coordinates(route_info["geometry"])
+        np.testing.assert_allclose(coordinates[0], [-74.006, 40.7128])
+        np.testing.assert_allclose(coordinates[-1], [-87.6298, 41.8781])
+
+        trip.refresh_from_db()
+        self.assertEqual(trip.status, "processed")
+        self.assertTrue(ELDLog.objects.filter(trip=trip).exists())
+
+    def test_rate_limited_route_gives_up_after_retry_timeout(self):
+        """
+        Test that the client retries a stub answering 429 and that the route
+        calculation fails cleanly once the retry budget is spent.
+        """
+        server = self.start_stub(rate_limit_rate=1.0)
+        with (
+            patch.dict(
+                os.environ,
+                {"OPENROUTESERVICE_BASE_URL": server.url, "OPENROUTESERVICE_RETRY_TIMEOUT": "0.5"},
+            ),
+            self.assertWarnsRegex(UserWarning, "Rate limit exceeded"),
+        ):
+            route_info = RouteService().calculate_route([[-74.006, 40.7128], [-87.6298, 41.8781]])
+
+        self.assertIsNone(route_info)
+        self.assertGreater(server.request_count, 1)
+
+    def test_loadtest_summary(self):
+        """
+        Test that load-test results are aggregated per endpoint, counting failed
+        and non-2xx requests as errors.
+        """
+        results = [("create", 201, 0.2), ("create", 0, 1.0)] + [
+            ("logs", 200, (i + 1) / 1000) for i in range(100)
+        ]
+
+        create, logs = summarize(results, elapsed=2.0)
+
+        self.assertEqual(
+            (create["operation"], create["requests"], create["errors"]), ("create", 2, 1)
+        )
+        self.assertEqual(create["max"], 1000)
+        self.assertEqual(logs["throughput"], 50)
+        self.assertAlmostEqual(logs["p50"], 50.5)
+        self.assertAlmostEqual(logs["p99"], 99.01)
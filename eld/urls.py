@@ -1,17 +1,36 @@
 from django.urls import path
 
 from .views import (
+    DriverListCreateAPIView,
+    DriverRetrieveUpdateDestroyAPIView,
     ELDLogListAPIView,
+    StatsAPIView,
+    TripEventStreamView,
     TripListCreateAPIView,
+    TripMapAPIView,
     TripRetrieveUpdateDestroyAPIView,
+    TripRouteStepsAPIView,
+    TripSimulationAPIView,
 )
 
 urlpatterns = [
+    path("drivers/", DriverListCreateAPIView.as_view(), name="driver-list-create"),
+    path(
+        "drivers/<int:pk>/",
+        DriverRetrieveUpdateDestroyAPIView.as_view(),
+        name="driver-retrieve-update-destroy",
+    ),
     path("trips/", TripListCreateAPIView.as_view(), name="trip-list-create"),
+    path("trips/map/", TripMapAPIView.as_view(), name="trip-map"),
+    path("trips/simulate/", TripSimulationAPIView.as_view(), name="trip-simulate"),
+    path("trips/events/", TripEventStreamView.as_view(), name="fleet-event-stream"),
     path(
         "trips/<int:pk>/",
         TripRetrieveUpdateDestroyAPIView.as_view(),
         name="trip-retrieve-update-destroy",
     ),
     path("trips/<int:trip_pk>/logs/", ELDLogListAPIView.as_view(), name="eld-log-list"),
+    path("trips/<int:pk>/steps/", TripRouteStepsAPIView.as_view(), name="trip-route-steps"),
+    path("trips/<int:pk>/events/", TripEventStreamView.as_view(), name="trip-event-stream"),
+    path("stats/", StatsAPIView.as_view(), name="stats"),
 ]
@@ -1,16 +1,67 @@
+import json
 import logging
+from decimal import Decimal
 
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework import generics, status
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
-from .models import ELDLog, Trip
-from .serializers import ELDLogSerializer, TripSerializer
-from .services import ELDService, RouteService  # Import the services
+from .events import FLEET_CHANNEL, get_broker, trip_channel
+from .models import Driver, ELDLog, Trip
+from .serializers import (
+    DriverSerializer,
+    ELDLogSerializer,
+    RouteStepSerializer,
+    StatsSerializer,
+    TripMapQuerySerializer,
+    TripSerializer,
+    TripSimulationResultSerializer,
+    TripSimulationSerializer,
+)
+from .services import (  # Import the services
+    DutyLedgerService,
+    IdempotencyService,
+    MapService,
+    RouteStepSequence,
+    StatsService,
+    TripProcessingService,
+    TripSimulationService,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class DriverListCreateAPIView(generics.ListCreateAPIView):
+    """
+    API view to retrieve a list of drivers or create a new driver.
+    """
+
+    serializer_class = DriverSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        return DutyLedgerService().with_cycle_seconds(Driver.objects.order_by("name"))
+
+
+class DriverRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    API view to retrieve, update, or delete a driver.
+    """
+
+    serializer_class = DriverSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        return DutyLedgerService().with_cycle_seconds(Driver.objects.all())
+
+
 class TripListCreateAPIView(generics.ListCreateAPIView):
     """
     API view to retrieve a list of trips or create a new trip.
@@ -20,62 +71,57 @@ class TripListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = TripSerializer
     permission_classes = [AllowAny]
 
-    def perform_create(self, serializer):
-        trip = serializer.save()
+    def create(self, request, *args, **kwargs):
+        """
+        Creates a trip, honouring an optional ``Idempotency-Key`` header so that
+        client retries replay the first response instead of creating duplicates.
+        """
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return super().create(request, *args, **kwargs)
 
-        # Extract coordinates for routing
-        # Assuming location JSONField stores {"latitude": X, "longitude": Y}
-        try:
-            pickup_coords = [trip.pickup_location["longitude"], trip.pickup_location["latitude"]]
-            dropoff_coords = [trip.dropoff_location["longitude"], trip.dropoff_location["latitude"]]
-        except KeyError:
-            logger.error(
-                f"Invalid location data for Trip {trip.id}. Missing 'latitude' or 'longitude'."
-            )
-            # Optionally, delete the trip or mark it as invalid
-            return Response(
-                {"detail": "Invalid location data provided."}, status=status.HTTP_400_BAD_REQUEST
-            )
+        idempotency_service = IdempotencyService()
+        request_hash = idempotency_service.fingerprint(request.data)
+        record, created = idempotency_service.acquire(key, request_hash)
 
-        # Calculate route
-        try:
-            route_service = RouteService()
-            route_info = route_service.calculate_route(coordinates=[pickup_coords, dropoff_coords])
-
-            if route_info:
-                # Store route geometry and waypoints in the trip for later use (e.g., frontend map display)
-                trip.route_geometry = route_info[
-                    "geometry"
-                ]  # Assuming you add this field to Trip model
-                trip.route_waypoints = route_info[
-                    "waypoints"
-                ]  # Assuming you add this field to Trip model
-                trip.save(
-                    update_fields=["route_geometry", "route_waypoints"]
-                )  # Save the updated fields
-
-                # Generate ELD logs
-                eld_service = ELDService()
-                eld_service.generate_eld_logs(trip, route_info)
-                logger.info(f"ELD logs generated for Trip {trip.id}")
-            else:
-                logger.warning(
-                    f"Could not calculate route for Trip {trip.id}. No ELD logs generated."
+        if not created:
+            if record.request_hash != request_hash:
+                return Response(
+                    {"detail": "Idempotency-Key has already been used with a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            completed = idempotency_service.wait_for_result(record)
+            if completed is None:
+                return Response(
+                    {"detail": "A request with this Idempotency-Key is still being processed."},
+                    status=status.HTTP_409_CONFLICT,
                 )
-                # Handle this case, e.g., return an error response, or mark trip for manual review
-        except ValueError as e:
-            logger.error(f"Configuration error for Trip {trip.id}: {e}")
-            # This is typically due to missing API key
-            return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except Exception as e:
-            logger.error(
-                f"Error during route calculation or ELD log generation for Trip {trip.id}: {e}"
-            )
             return Response(
-                {"detail": "Error processing trip route or logs."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                completed.response_body,
+                status=completed.status_code,
+                headers={"Idempotent-Replayed": "true"},
             )
 
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            idempotency_service.release(record)
+            raise
+
+        if response.status_code >= 500:
+            # Server errors are not cached so the client can retry them
+            idempotency_service.release(record)
+        else:
+            idempotency_service.store(record, response.status_code, response.data)
+        return response
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            trip = serializer.save()
+            StatsService().record_trip_created(trip)
+        # Route the trip and generate its ELD logs; the outcome is recorded in trip.status
+        TripProcessingService().process(trip)
+
 
 class TripRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -86,6 +132,74 @@ class TripRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TripSerializer
     permission_classes = [AllowAny]
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Lock the trip so concurrent reassignments move the hours off the right driver
+            old_driver_id = (
+                Trip.objects.select_for_update()
+                .values_list("driver_id", flat=True)
+                .get(pk=serializer.instance.pk)
+            )
+            trip = serializer.save()
+            DutyLedgerService().record_trip_reassigned(trip, old_driver_id)
+        # Locations may have moved; keep the fleet map in sync
+        MapService().index_trip(trip)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            removed = Trip.objects.filter(pk=instance.pk)
+            StatsService().record_trips_removed(removed)
+            DutyLedgerService().record_trips_removed(removed)
+            MapService().invalidate_trip(instance)
+            instance.delete()
+
+
+class RouteStepPagination(LimitOffsetPagination):
+    default_limit = 50
+    max_limit = 500
+
+
+class TripRouteStepsAPIView(generics.ListAPIView):
+    """
+    API view to page through the turn-by-turn steps of a trip's route.
+
+    ``GET /api/trips/<pk>/steps/?offset=&limit=`` only rebuilds the requested
+    steps from the trip's columnar ``TripRouteSteps`` row.
+    """
+
+    serializer_class = RouteStepSerializer
+    pagination_class = RouteStepPagination
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        trip = get_object_or_404(Trip.objects.select_related("route_steps"), pk=self.kwargs["pk"])
+        return RouteStepSequence(getattr(trip, "route_steps", None))
+
+
+class TripMapAPIView(generics.GenericAPIView):
+    """
+    API view returning the fleet map of a bounding box as one GeoJSON FeatureCollection.
+
+    ``GET /api/trips/map/?bbox=min_lon,min_lat,max_lon,max_lat&zoom=z`` returns
+    grid-clustered pickup and dropoff points and the routes crossing the bbox,
+    simplified for the zoom level. Tiles are cached, so panning reuses them.
+    """
+
+    serializer_class = TripMapQuerySerializer
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            feature_collection = MapService().feature_collection(
+                serializer.validated_data["bbox"], serializer.validated_data["zoom"]
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(feature_collection)
+
 
 class ELDLogListAPIView(generics.ListAPIView):
     """
@@ -102,3 +216,143 @@ class ELDLogListAPIView(generics.ListAPIView):
         """
         trip_pk = self.kwargs["trip_pk"]
         return ELDLog.objects.filter(trip__pk=trip_pk)
+
+
+class StatsAPIView(generics.GenericAPIView):
+    """
+    API view returning dashboard statistics from the precomputed counters.
+
+    ``GET /api/stats/?days=N`` returns trip counts by status and driving hours,
+    all-time and for each of the last N days (default 7, at most 90).
+    """
+
+    serializer_class = StatsSerializer
+    permission_classes = [AllowAny]
+    MAX_DAYS = 90
+
+    def get(self, request, *args, **kwargs):
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= self.MAX_DAYS:
+            return Response(
+                {"detail": f"days must be an integer between 1 and {self.MAX_DAYS}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(self.get_serializer(StatsService().summary(days)).data)
+
+
+class TripSimulationAPIView(generics.GenericAPIView):
+    """
+    API view to compare a trip's HOS plan across departure times and cycle values.
+
+    Read-only: the route is fetched once (and cached) and no trip or ELD log is written.
+    """
+
+    serializer_class = TripSimulationSerializer
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        departure_times = data["departure_times"]
+        if "current_cycle_used" in data:
+            cycle_values = [data["current_cycle_used"]] * len(departure_times)
+        elif data.get("driver"):
+            # The 8-day window rolls, so each departure uses the cycle as of its own day
+            cycle_values = [
+                [cycle]
+                for cycle in DutyLedgerService().cycle_used_hours_at(
+                    data["driver"].id, departure_times
+                )
+            ]
+        else:
+            cycle_values = [[Decimal("0.00")]] * len(departure_times)
+
+        try:
+            result = TripSimulationService().simulate(
+                data["pickup_location"],
+                data["dropoff_location"],
+                departure_times,
+                cycle_values,
+            )
+        except ValueError as e:
+            # This is typically due to missing API key
+            logger.error(f"Configuration error during trip simulation: {e}")
+            return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if result is None:
+            return Response(
+                {"detail": "Could not calculate a route between the given locations."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(TripSimulationResultSerializer(result).data)
+
+
+class TripEventStreamView(View):
+    """
+    Server-sent events stream of trip processing events.
+
+    ``GET /api/trips/<pk>/events/`` streams the status transitions and the
+    "logs_ready" event of one trip and closes once the trip leaves ``pending``.
+    ``GET /api/trips/events/`` streams the events of every trip in the fleet.
+
+    ``POST /api/trips/`` processes the trip before responding, so its creator
+    already has the final status; a per-trip stream only shows live events to
+    other clients watching a trip while it is processed. Follow new trips
+    through the fleet stream.
+
+    The view is async and must be served by an ASGI server, where an idle
+    connection costs one queue and one suspended coroutine. Under WSGI each
+    stream would hold a worker for its whole lifetime, so it answers 501 there.
+    """
+
+    async def get(self, request, pk=None):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {"detail": "Event streams require an ASGI server (see Dockerfile)."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        # Subscribe before reading the status so no transition in between is missed
+        channel = FLEET_CHANNEL if pk is None else trip_channel(pk)
+        subscription = get_broker().subscribe([channel])
+        trip_status = None
+        if pk is not None:
+            trip = await Trip.objects.filter(pk=pk).only("status").afirst()
+            if trip is None:
+                get_broker().unsubscribe(subscription)
+                raise Http404("Trip not found.")
+            trip_status = trip.status
+
+        response = StreamingHttpResponse(
+            self.stream(subscription, pk, trip_status), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # Disable proxy buffering (nginx)
+        return response
+
+    async def stream(self, subscription, pk, trip_status):
+        async with subscription:
+            if pk is not None:
+                yield self.format_event({"event": "status", "trip": pk, "status": trip_status})
+                if trip_status != "pending":
+                    return
+
+            while True:
+                event = await subscription.get(timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+                if event is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield self.format_event(event)
+                if pk is not None and event["event"] == "status" and event["status"] != "pending":
+                    return
+
+    @staticmethod
+    def format_event(event: dict) -> str:
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"